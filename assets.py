@@ -0,0 +1,81 @@
+import concurrent.futures
+import logging
+import os
+
+import pygame
+
+logger = logging.getLogger(__name__)
+
+
+class Assets:
+    """
+    Loads each image file once and hands out the same surface to everyone who asks for it
+
+    Once the display has been set up, images are converted to the display's pixel format, so they blit faster
+    Surfaces are shared, so they must not be drawn on
+    """
+    def __init__(self):
+        self._images = {}
+        self._loading = {}
+        self._executor = None
+
+    def image(self, *path, opaque=False):
+        """
+        opaque: the image has no transparent pixels, so can be converted without an alpha channel
+        """
+        filename = os.path.join(*path)
+        image = self._images.get(filename)
+        if image is None:
+            loading = self._loading.pop(filename, None)
+            image = loading.result() if loading is not None else pygame.image.load(filename)
+            image = self.convert(image, opaque)
+            self._images[filename] = image
+        return image
+
+    def prefetch(self, *path):
+        """
+        Start decoding an image on a background thread, so a later call to image() does not have to wait
+        Converting to the display format still happens in image(), on the main thread
+        """
+        filename = os.path.join(*path)
+        if filename in self._images or filename in self._loading:
+            return
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._loading[filename] = self._executor.submit(pygame.image.load, filename)
+
+    def is_loaded(self, *path):
+        return os.path.join(*path) in self._images
+
+    def release(self, *path):
+        """
+        Forget an image, so its memory can be freed once nobody else holds on to the surface
+        """
+        filename = os.path.join(*path)
+        self._images.pop(filename, None)
+        self._loading.pop(filename, None)
+
+    @staticmethod
+    def convert(image, opaque=False):
+        """
+        Convert image to the display's pixel format, if there is a display
+        """
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            return image.convert() if opaque else image.convert_alpha()
+        return image
+
+    def memory_used(self, filenames=None):
+        """
+        Approximate number of bytes held in pixel data, for all images or just those in filenames
+        """
+        images = self._images.values() if filenames is None else [
+            self._images[filename] for filename in filenames if filename in self._images
+        ]
+        return sum(image.get_pitch() * image.get_height() for image in images)
+
+    def report(self):
+        return f'{len(self._images)} images, {self.memory_used() / 1024 / 1024:.1f} MB'
+
+
+assets = Assets()
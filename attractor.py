@@ -7,5 +7,10 @@ class Attractor:
         self.weight = weight
         self.distance = distance
 
+    @property
+    def radius(self):
+        # Boids closer than distance are attracted
+        return self.distance
+
     def draw(self, canvas):
         pygame.draw.circle(canvas, pygame.Color('red'), self.location, self.distance, 1)
@@ -0,0 +1,176 @@
+"""
+Time the phases of a flock update, and drawing the flock, for synthetic flocks of different sizes
+
+    python benchmark.py --sizes 10 100 1000 10000 --rounds 3 --output benchmark_results.json
+
+Each round runs every phase once over the whole flock, in the same order as Flock.update
+Forces are applied boid by boid, all forces for one boid then the next, as Flock.update does, whether or not the
+force is active in the game
+The neighbourhood totals which Separation, Alignment and Cohesion share are gathered once per boid, and timed as
+a phase of their own, so the three forces are not each charged for them
+With --flock-arrays each force is timed over the whole flock at once instead, as in Flock.apply_forces_to_store
+Results are written as JSON, so runs can be compared with each other
+"""
+import argparse
+import collections
+import datetime
+import json
+import platform
+import random
+import statistics
+import time
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from settings import Settings
+import game
+from boid import Boid
+from states import states
+
+
+def build_flock(level, size):
+    random.seed(size)
+    flock = level.flock
+    for boid in list(flock.boids):
+        flock.remove_boid(boid)
+
+    for i in range(size):
+        location = pygame.Vector2(
+            random.uniform(0, Settings.screen_size.x),
+            random.uniform(0, Settings.screen_size.y)
+        )
+        velocity = pygame.Vector2(0, 0)
+        velocity.from_polar((
+            random.uniform(Settings.minimum_starting_speed, Settings.maximum_starting_speed),
+            random.uniform(0, 360)
+        ))
+        boid = Boid(flock, location, velocity, age=Settings.boid_adult_age)
+
+        # Half the flock is hungry, so the hunger force has some work to do
+        if i % 2:
+            boid.food = Settings.boid_hungry_level
+        flock.add_boid(boid)
+
+    flock.leader = flock.boids[0]
+    return flock
+
+
+def timed(timings, phase, function):
+    start = time.perf_counter()
+    function()
+    timings[phase].append(time.perf_counter() - start)
+
+
+def apply_forces(flock, duration, timings):
+    """
+    The fused per boid force stage of Flock.update, timing each part, as Flock.apply_forces_profiled does
+    """
+    perf_counter = time.perf_counter
+    totals = collections.defaultdict(float)
+    for boid in flock.boids:
+        start = perf_counter()
+        flock.neighbourhood(boid)
+        totals['neighbourhood'] += perf_counter() - start
+        for name, force in flock.forces.items():
+            start = perf_counter()
+            force.apply(boid, duration)
+            totals[f'force:{name}'] += perf_counter() - start
+        start = perf_counter()
+        boid.apply_net_force()
+        totals['apply_net_force'] += perf_counter() - start
+
+    for phase, seconds in totals.items():
+        timings[phase].append(seconds)
+
+
+def apply_forces_to_store(flock, duration, timings):
+    net_forces = numpy.zeros((len(flock.boids), 2))
+    timed(timings, 'neighbourhood', flock.neighbourhood_totals)
+    for name, force in flock.forces.items():
+        timed(timings, f'force:{name}', lambda: force.apply_all(duration, net_forces))
+    timed(timings, 'apply_net_force', lambda: flock.store.apply_net_forces(
+        net_forces,
+        numpy.full(len(flock.boids), float(Settings.boid_maximum_speed)),
+        flock.store.states == states.LANDING.code
+    ))
+
+
+def run_round(flock, duration, timings):
+    timed(timings, 'calculate_distances', flock.calculate_distances)
+    timed(timings, 'calculate_neighbours', flock.calculate_neighbours)
+    if flock.store is None:
+        apply_forces(flock, duration, timings)
+        timed(timings, 'Boid.update', lambda: [boid.update(duration) for boid in list(flock.boids)])
+    else:
+        apply_forces_to_store(flock, duration, timings)
+        timed(timings, 'Boid.update', lambda: flock.update_store(duration))
+    timed(timings, 'Flock.draw', flock.draw)
+
+
+def benchmark(level, sizes, rounds, duration):
+    results = []
+    for size in sizes:
+        flock = build_flock(level, size)
+        timings = collections.defaultdict(list)
+        for _ in range(rounds):
+            run_round(flock, duration, timings)
+
+        for phase, times in timings.items():
+            result = {
+                'boids': size,
+                'phase': phase,
+                'rounds': rounds,
+                'mean_ms': statistics.mean(times) * 1000,
+                'min_ms': min(times) * 1000,
+                'max_ms': max(times) * 1000,
+            }
+            results.append(result)
+            print(f"{size:>6} {phase:<28} {result['mean_ms']:>10.2f} ms (min {result['min_ms']:.2f})")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--level', type=int, default=4)
+    parser.add_argument('--dt', type=float, default=1/30)
+    parser.add_argument('--flock-arrays', action='store_true')
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+    if args.flock_arrays:
+        Settings.use_flock_arrays = True
+
+    # Draw to an off-screen surface, so no display is needed
+    pygame.font.init()
+    canvas = pygame.Surface(Settings.screen_size_as_integer)
+    the_game = game.Game(canvas, starting_level=args.level)
+    level = the_game.level
+
+    # Grow the flowers, so there are food sources for the hungry boids
+    [flower.update(Settings.flower_adult_age) for flower in level.flowers]
+
+    results = benchmark(level, args.sizes, args.rounds, args.dt)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'level': args.level,
+            'dt': args.dt,
+            'flock_arrays': Settings.use_flock_arrays,
+            'results': results,
+        }, output_file, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,17 @@
-import os
 import random
 import collections
 import datetime
+import math
 
 import pygame
 
 from settings import Settings
+from assets import assets
 
 # TODO: Remove this
 from enums import BoidSex, Events
 import utilities
-from states import states
+from states import states, end_death_clocks
 
 random.seed(10)
 
@@ -24,7 +25,14 @@ class Boid:
 
     def __init__(self, flock, location, velocity, sex=None, age=0):
         self.id = Boid.next_id
-        self.death_clock = None
+        # When the flock has a FlockStore, location, velocity, food, state and the rest of what the flock updates
+        # as arrays live in row slot of store
+        self.store = None
+        self.slot = None
+        self._state = None
+        self._death_time = None
+        # The food event scheduled with the event handler, see schedule_food_event
+        self._food_timer = None
         self.alive = True
         Boid.next_id += 1
         self.flock = flock
@@ -32,8 +40,10 @@ class Boid:
         self.canvas = flock.canvas
         self.location = location
         self.velocity = velocity
+        self.previous_location = pygame.Vector2(location)
         self.sex = random.choice(list(BoidSex)) if sex is None else sex
         self.mass = 1
+        self.net_force = pygame.Vector2(0, 0)
         # self.history = collections.deque(maxlen=50)
         self.state = states.FLYING
         self.waiting_period = None
@@ -44,13 +54,14 @@ class Boid:
 
         # Keep track of which flowers have been visited and exhausted
         self.exhausted_food_sources = collections.deque(maxlen=4)
+        # Food source the boid heads for when hungry, and the version of the food sources it was chosen from
+        self.food_target = None
+        self.food_target_version = None
         self.feeding_from = None
         self.leader_speed_multiplier = 1
         self.in_landing_zone = False
         self.status_icons = {
-            state: pygame.image.load(
-                os.path.join('images', 'statuses', name + '.png')
-            )
+            state: assets.image('images', 'statuses', name + '.png')
             for state, name in [
                 (states.LANDED, 'landed'),
                 (states.LANDING, 'landing'),
@@ -61,6 +72,192 @@ class Boid:
             ]
         }
 
+    @property
+    def location(self):
+        if self.store is None:
+            return self._location
+        return pygame.Vector2(*self.store.positions[self.slot])
+
+    @location.setter
+    def location(self, location):
+        if self.store is None:
+            self._location = location
+        else:
+            self.store.positions[self.slot] = location
+
+    @property
+    def previous_location(self):
+        """
+        Location before the most recent update, for drawing in between simulation steps
+        """
+        if self.store is None:
+            return self._previous_location
+        return pygame.Vector2(*self.store.previous_positions[self.slot])
+
+    @previous_location.setter
+    def previous_location(self, previous_location):
+        if self.store is None:
+            self._previous_location = previous_location
+        else:
+            self.store.previous_positions[self.slot] = previous_location
+
+    @property
+    def velocity(self):
+        if self.store is None:
+            return self._velocity
+        return pygame.Vector2(*self.store.velocities[self.slot])
+
+    @velocity.setter
+    def velocity(self, velocity):
+        if self.store is None:
+            self._velocity = velocity
+        else:
+            self.store.velocities[self.slot] = velocity
+
+    @property
+    def food(self):
+        """
+        Food goes down, and up whilst feeding, at a steady rate, so is worked out from when it was last set
+        """
+        if self.store is None:
+            food, food_time = self._food, self._food_time
+        else:
+            food, food_time = float(self.store.food[self.slot]), float(self.store.food_times[self.slot])
+        return food + self.food_rate * (self.game.event_handler.time - food_time)
+
+    @food.setter
+    def food(self, food):
+        now = self.game.event_handler.time
+        if self.store is None:
+            self._food, self._food_time = food, now
+        else:
+            self.store.food[self.slot], self.store.food_times[self.slot] = food, now
+        self.schedule_food_event()
+
+    @property
+    def food_rate(self):
+        """
+        Change in food per second
+        """
+        return (-1 if self.game.boids_need_food else 0) + self.state.food_rate
+
+    @property
+    def state(self):
+        if self.store is None:
+            return self._state
+        return states.by_code[self.store.states[self.slot]]
+
+    @state.setter
+    def state(self, state):
+        old_state = self.state
+        # Which food event comes next depends on the state, as can how fast food changes
+        food = self.food if old_state is not None and state is not old_state else None
+        if self.store is None:
+            self._state = state
+        else:
+            self.store.states[self.slot] = state.code
+        if state is not old_state:
+            self.flock.state_changed(self, old_state, state)
+            if food is not None:
+                self.food = food
+
+    @property
+    def death_time(self):
+        """
+        Simulation time at which the boid dies, once it is dying
+        """
+        if self.store is None:
+            return self._death_time
+        death_time = float(self.store.death_times[self.slot])
+        return None if math.isnan(death_time) else death_time
+
+    @death_time.setter
+    def death_time(self, death_time):
+        if self.store is None:
+            self._death_time = death_time
+        else:
+            self.store.death_times[self.slot] = math.nan if death_time is None else death_time
+
+    @property
+    def age(self):
+        if self.store is None:
+            return self._age
+        return float(self.store.ages[self.slot])
+
+    @age.setter
+    def age(self, age):
+        if self.store is None:
+            self._age = age
+        else:
+            self.store.ages[self.slot] = age
+
+    @property
+    def in_landing_zone(self):
+        if self.store is None:
+            return self._in_landing_zone
+        return bool(self.store.in_landing_zone[self.slot])
+
+    @in_landing_zone.setter
+    def in_landing_zone(self, in_landing_zone):
+        if self.store is None:
+            self._in_landing_zone = in_landing_zone
+        else:
+            self.store.in_landing_zone[self.slot] = in_landing_zone
+
+    @property
+    def death_clock(self):
+        death_time = self.death_time
+        return None if death_time is None else death_time - self.game.event_handler.time
+
+    @death_clock.setter
+    def death_clock(self, death_clock):
+        if death_clock is None:
+            self.death_time = None
+            return
+
+        event_handler = self.game.event_handler
+        self.death_time = event_handler.time + death_clock
+        event_handler.schedule(death_clock, end_death_clocks, [self], self.death_time)
+
+    def die(self):
+        self.alive = False
+        self.game.event_handler.cancel(self._food_timer)
+        self._food_timer = None
+
+    def _stored(self):
+        """
+        The values which live in the store row, in the order _restore sets them
+        """
+        return (
+            self.location, self.previous_location, self.velocity, self.state, self.food, self.death_time, self.age,
+            self.in_landing_zone,
+        )
+
+    def _restore(self, values):
+        # State before food, as the food event depends on the state
+        self.location, self.previous_location, self.velocity, self.state, self.food, self.death_time, self.age, \
+            self.in_landing_zone = values
+
+    def attach(self, store):
+        """
+        Move the values the store holds - location, velocity, food, state and so on - into a new row of store
+        """
+        values = self._stored()
+        self.store = store
+        store.add(self)
+        self._restore(values)
+
+    def detach(self):
+        """
+        Copy the values the store holds back onto the boid itself
+        The caller is responsible for removing the row from the store
+        """
+        values = self._stored()
+        self.store = None
+        self.slot = None
+        self._state = None
+        self._restore(values)
+
     @property
     def is_leader(self):
         return self.flock.leader == self
@@ -82,37 +279,51 @@ class Boid:
         size = 'large' if self.is_leader else 'small'
         sex = 'female' if self.sex == BoidSex.FEMALE else 'male'
         _, angle = self.velocity.as_polar()
-        angle = (15 * int(angle // 15)) % 360
+        step = Settings.butterfly_angle_step
+        angle = (step * int(angle // step)) % 360
         return self.game.images[(size, sex, angle)]
 
-    def draw(self):
+    def sprites(self, interpolation=1):
+        """
+        The images drawn for the boid - the butterfly and its status icon, if any - with where they go
+        interpolation: how far to draw the boid from its previous location (0) to its current location (1)
+        """
+        location = self.location
+        if interpolation < 1:
+            location = self.previous_location.lerp(location, interpolation)
+
         image = self.image
-        rect = image.get_rect()
-        rect.center = self.location
-        self.canvas.blit(image, rect)
+        result = [(image, image.get_rect(center=location).topleft)]
         icon = self.status_icons.get(self.state)
         if icon:
             icon_offset = Settings.leader_status_icon_offset if self.is_leader else Settings.boid_status_icon_offset
-            self.canvas.blit(icon, self.location + icon_offset)
+            result.append((icon, location + icon_offset))
+        return result
 
     def apply_force(self, force, essential=False):
-        acceleration = force / self.mass
-        velocity = self.velocity + acceleration
-        speed, direction = velocity.as_polar()
+        velocity = self.velocity + force / self.mass
 
-        # Whilst LANDING, any upward force is ignored (anything above 180 degrees)
-        if self.state == states.LANDING and force and not essential:
-            direction = direction % 360
-            if direction > 180:
-                return
+        # Whilst LANDING, any force which would make the boid go upwards is ignored
+        if self.state == states.LANDING and force and not essential and velocity.y < 0:
+            return
 
         maximum_speed = Settings.boid_maximum_speed
         if self.is_leader:
             maximum_speed *= self.leader_speed_multiplier
-        speed = min(speed, maximum_speed)
-        self.velocity.from_polar((speed, direction))
-        # if self.is_leader:
-        #     print('New speed: ', speed)
+        if velocity.length_squared() > maximum_speed * maximum_speed:
+            velocity.scale_to_length(maximum_speed)
+        self.velocity = velocity
+
+    def add_force(self, force):
+        """
+        Add force to the total for this tick, which is applied by apply_net_force
+        """
+        self.net_force += force
+
+    def apply_net_force(self):
+        if self.net_force:
+            self.apply_force(self.net_force)
+            self.net_force = pygame.Vector2(0, 0)
 
     def turn_left(self):
         # TODO: DRY?
@@ -157,10 +368,8 @@ class Boid:
             print('Landing')
 
     def landed_on_food_source(self):
-        for food_source in self.flock.game.food_sources:
-            if utilities.distance_between_points(self.location, food_source.location) <= food_source.radius:
-                return food_source
-        return None
+        food_sources = self.flock.level.food_sources.containing(self.location)
+        return food_sources[0] if food_sources else None
 
     # def move_to_next_level(self):
 
@@ -218,51 +427,56 @@ class Boid:
 
     def check_food_sources(self):
         if self.state == states.HUNGRY:
-            for food_source in self.flock.level.game.food_sources:
-                if utilities.distance_between_points(self.location, food_source.location) < food_source.radius:
-                    self.feeding_from = food_source
-                    self.game.handle_event(Events.START_FEEDING, self)
-
-    def check_hungry(self, duration):
-        was_hungry = self.is_hungry
-        if self.game.boids_need_food:
-            self.food -= duration
-        if self.is_hungry and not was_hungry:
-            self.game.handle_event(Events.GOT_HUNGRY, self)
-        if self.food < 0 and self.state is not states.DYING:
-            self.game.handle_event(Events.STARVING, self)
-
-    def feed(self, duration):
-        if self.state is not states.FEEDING:
-            return
-
-        self.food += duration * Settings.feeding_speed
-
-        if self.food >= Settings.boid_maximum_food_level:
-            self.game.handle_event(Events.REPLETE)
-
-        #     if self.feeding_from.level > 0.1:
-        #         food = min(self.feeding_from.level, duration * Settings.feeding_speed, Settings.boid_maximum_food_level - self.food)
-        #         self.feeding_from.level -= food
-        #         self.food += food
-        #         return
+            for food_source in self.flock.level.food_sources.containing(self.location):
+                self.feeding_from = food_source
+                self.game.handle_event(Events.START_FEEDING, self)
+
+    def next_food_event(self):
+        """
+        The next event food leads to - getting hungry, starving or, whilst feeding, being full up - and the number
+        of seconds until it happens, or (None, None)
+        """
+        transitions = self.state.transitions
+        food, rate = self.food, self.food_rate
+        if food < 0 and Events.STARVING in transitions:
+            return Events.STARVING, 0
+        if rate > 0 and Events.REPLETE in transitions:
+            return Events.REPLETE, max(Settings.boid_maximum_food_level - food, 0) / rate
+        if rate < 0:
+            if food > Settings.boid_hungry_level:
+                return Events.GOT_HUNGRY, (food - Settings.boid_hungry_level) / -rate
+            if Events.STARVING in transitions:
+                return Events.STARVING, max(food, 0) / -rate
+        return None, None
+
+    def schedule_food_event(self):
+        """
+        Have the next food event sent when it happens, rather than checking the food every step
+        Called whenever the food, or the rate it changes at, is set
+        """
+        event_handler = self.game.event_handler
+        event_handler.cancel(self._food_timer)
+        self._food_timer = None
+        event, delay = self.next_food_event() if self.alive else (None, None)
+        if event is not None:
+            self._food_timer = event_handler.schedule(delay, self.send_food_event, event)
+
+    def send_food_event(self, event):
+        self._food_timer = None
+        self.game.handle_event(event, self)
+        self.schedule_food_event()
 
     def update(self, duration):
         # self.history.append(list(self.location))
+        self.previous_location = pygame.Vector2(self.location)
 
-        self.check_hungry(duration)
         self.check_food_sources()
-        self.feed(duration)
         self.age += duration
         if self.state not in [states.LANDED, states.SLEEPING, states.FEEDING]:
             self.location += self.velocity * duration
         self.check_exit_gate()
         self.check_entrance_gate()
         self.check_landing_zone()
-        if self.state == states.DYING:
-            self.death_clock -= duration
-            if self.death_clock <= 0:
-                self.alive = False
 
     def __str__(self):
         return f'<leader ({self.state})>' if self.is_leader else f'<boid {self.id} ({self.state})>'
@@ -1,6 +1,4 @@
-import os
-
-import pygame
+from assets import assets
 
 
 class Button:
@@ -13,15 +11,22 @@ class Button:
         self.active = True
         self.visible = True
 
-        self.active_image = pygame.image.load(os.path.join('images', 'buttons', f'{self.name}.png'))
-        self.inactive_image = pygame.image.load(os.path.join('images', 'buttons', f'{self.name}_inactive.png'))
+        self.active_image = assets.image('images', 'buttons', f'{self.name}.png')
+        self.inactive_image = assets.image('images', 'buttons', f'{self.name}_inactive.png')
+
+    @property
+    def image(self):
+        return self.active_image if self.active else self.inactive_image
+
+    @property
+    def rect(self):
+        return self.image.get_rect(topleft=self.location)
 
     def draw(self):
         if not self.visible:
             return
 
-        image = self.active_image if self.active else self.inactive_image
-        self.canvas.blit(image, self.location)
+        self.canvas.blit(self.image, self.location)
 
     def handle_mouse_click(self, mouse_location):
         if not self.visible:
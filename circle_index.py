@@ -0,0 +1,88 @@
+import itertools
+import math
+
+from spatial_hash import SpatialHash
+
+
+class CircleIndex:
+    """
+    Circular objects - anything with a location and a radius - indexed by the cell their centre is in
+    For objects which stay put: to move one, remove it and add it again
+    version changes whenever items are added or removed, and is never the same for two indexes
+    """
+    _versions = itertools.count()
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.clear()
+
+    def clear(self):
+        self._items = []
+        self._index = SpatialHash(self.cell_size)
+        self.maximum_radius = 0
+        # Bounding box of the centres, so nearest knows when to stop looking
+        self._bounds = None
+        self.version = next(self._versions)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def add(self, item):
+        self._items.append(item)
+        self._index.insert(item, item.location)
+        self.version = next(self._versions)
+        self.maximum_radius = max(self.maximum_radius, item.radius)
+        x, y = item.location
+        if self._bounds is None:
+            self._bounds = x, y, x, y
+        else:
+            min_x, min_y, max_x, max_y = self._bounds
+            self._bounds = min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y)
+
+    def remove(self, item):
+        self._items.remove(item)
+        self._index.remove(item, item.location)
+        self.version = next(self._versions)
+
+    def within(self, location, distance):
+        """
+        Items with their centre at most distance from location
+        """
+        distance_squared = distance * distance
+        return [
+            item for item in self._index.nearby(location, distance)
+            if item.location.distance_squared_to(location) <= distance_squared
+        ]
+
+    def containing(self, location):
+        """
+        Items with location inside their circle
+        """
+        return [
+            item for item in self._index.nearby(location, self.maximum_radius)
+            if item.location.distance_squared_to(location) < item.radius * item.radius
+        ]
+
+    def nearest(self, location, accept=None):
+        """
+        The item with its centre nearest to location, only counting items for which accept(item) is true
+        None if there are no such items
+        Looks within cell_size first, doubling the distance until something is found
+        """
+        if not self._items:
+            return None
+
+        x, y = location
+        min_x, min_y, max_x, max_y = self._bounds
+        furthest = math.hypot(max(abs(x - min_x), abs(x - max_x)), max(abs(y - min_y), abs(y - max_y)))
+        distance = self.cell_size
+        while True:
+            items = [item for item in self.within(location, distance) if accept is None or accept(item)]
+            if items:
+                return min(items, key=lambda item: item.location.distance_squared_to(location))
+            if distance >= furthest:
+                return None
+            distance *= 2
@@ -0,0 +1,172 @@
+import collections
+
+import pygame
+
+import enums
+from settings import Settings
+
+
+def merge_rects(rects, margin=0):
+    """
+    Grow each rect by margin on every side, then combine overlapping rects until none of them overlap
+    """
+    merged = []
+    for rect in rects:
+        rect = rect.inflate(margin * 2, margin * 2)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+def changed_rects(previous, current):
+    """
+    previous and current map a key for each item on screen to its (rect, appearance)
+    Returns the rects to redraw: both the old and new rect of each item which moved or changed,
+    the new rect of each item which appeared, and the old rect of each item which disappeared
+    """
+    rects = []
+    for key, (rect, appearance) in current.items():
+        old = previous.get(key)
+        if old is None:
+            rects.append(rect)
+        elif old[0] != rect or old[1] != appearance:
+            rects.append(old[0])
+            rects.append(rect)
+    rects.extend(rect for key, (rect, _) in previous.items() if key not in current)
+    return rects
+
+
+class DirtyRectRenderer:
+    """
+    Redraws only the parts of the screen which changed since the last frame
+
+    Each frame, everything on screen is listed as layers, in the order Game.draw_scene draws them, with its rect
+    and appearance, which are compared with the last frame
+    Each changed rect is redrawn by drawing just the layers which overlap it, clipped to it, so the background is
+    restored and everything on top of it is drawn again in the usual order, and only those rects are sent to the
+    display
+    When more than Settings.dirty_rect_maximum_fraction of the screen changed, the whole screen is drawn instead
+    """
+    def __init__(self, game):
+        self.game = game
+        self.canvas = game.canvas
+        self.screen_rect = self.canvas.get_rect()
+        self._items = None
+
+    def invalidate(self):
+        """
+        Draw the whole screen next frame, e.g. after the window was covered
+        """
+        self._items = None
+
+    def gate_layer(self, key, position, colour):
+        rect = pygame.Rect(0, 0, Settings.gate_radius * 2 + 1, Settings.gate_radius * 2 + 1)
+        rect.center = position
+        return key, rect, tuple(colour), lambda: pygame.draw.circle(
+            self.canvas, colour, position, Settings.gate_radius, 2
+        )
+
+    def layers(self, interpolation):
+        """
+        Everything on screen, in drawing order, as (key, rect, appearance, drawing)
+        drawing is either an image to blit at the rect, or a function which draws it
+        """
+        game = self.game
+        level = game.level
+        # Changing level or game state redraws the whole screen
+        layers = [('screen', self.screen_rect, (level, game.state), level.background)]
+
+        for i, flower in enumerate(level.flowers):
+            image, rect = flower.sprite()
+            layers.append((('flower', i), rect, image, image))
+
+        # Butterflies, then their status icons grouped by state, as in Flock.draw
+        icons = collections.defaultdict(list)
+        for boid in level.flock.boids:
+            for i, (image, position) in enumerate(boid.sprites(interpolation)):
+                layer = ('boid', boid, i), image.get_rect(topleft=position), image, image
+                if i:
+                    icons[boid.state].append(layer)
+                else:
+                    layers.append(layer)
+        for group in icons.values():
+            layers.extend(group)
+
+        # As in Level.draw
+        if level.entrance_gate_position:
+            layers.append(self.gate_layer('entrance gate', level.entrance_gate_position, pygame.Color('green')))
+        if level.exit_gate_position:
+            layers.append(self.gate_layer('exit gate', level.exit_gate_position, level.exit_gate_colour))
+
+        console_image = level.console_image
+        layers.append(('console', console_image.get_rect(), console_image, console_image))
+
+        time_keeper = game.time_keeper
+        if time_keeper:
+            layers.append(('clock face', time_keeper.background_rect, time_keeper, time_keeper.background))
+            _, image, rect = time_keeper.hand()
+            layers.append(('clock hand', rect, image, image))
+
+        if game.state == enums.GameState.HELP:
+            layers.append(('help', game.help_image.get_rect(), game.help_image, game.help_image))
+        lines, location = game.console_text()
+        if lines:
+            surface = game.text_surface(lines, location)
+            layers.append(('console text', surface.get_rect(topleft=location), surface, surface))
+
+        for name, button in game.buttons.items():
+            if button.visible:
+                layers.append((('button', name), button.rect, button.image, button.image))
+
+        if game.profiler.enabled:
+            # The numbers change every frame
+            layers.append(('profiler', game.profiler_rect(), object(), game.show_profiler))
+
+        return layers
+
+    def redraw(self, rects, layers):
+        """
+        Draw the layers which overlap each of rects, clipped to it
+        """
+        canvas = self.canvas
+        layer_rects = [rect for (_, rect, _, _) in layers]
+        for rect in rects:
+            canvas.set_clip(rect)
+            for i in rect.collidelistall(layer_rects):
+                drawing = layers[i][3]
+                if callable(drawing):
+                    drawing()
+                else:
+                    canvas.blit(drawing, layer_rects[i])
+        canvas.set_clip(None)
+
+    def draw(self, interpolation=1):
+        game = self.game
+        game.update_buttons()
+        layers = self.layers(interpolation)
+        items = {key: (rect, appearance) for (key, rect, appearance, _) in layers}
+        previous, self._items = self._items, items
+
+        rects = None
+        if previous is not None:
+            rects = [
+                rect.clip(self.screen_rect)
+                for rect in merge_rects(changed_rects(previous, items), Settings.dirty_rect_margin)
+            ]
+            screen_area = self.screen_rect.width * self.screen_rect.height
+            if sum(rect.width * rect.height for rect in rects) > screen_area * Settings.dirty_rect_maximum_fraction:
+                rects = None
+
+        if rects is None:
+            game.draw_scene(interpolation)
+            with game.profiler.phase('pygame.display.flip'):
+                pygame.display.flip()
+            return
+
+        with game.profiler.phase('DirtyRectRenderer.redraw'):
+            self.redraw(rects, layers)
+        with game.profiler.phase('pygame.display.update'):
+            pygame.display.update(rects)
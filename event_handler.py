@@ -8,20 +8,15 @@ from settings import Settings
 from enums import Events, GameState
 import utilities
 from flower import Flower
-
-
-# class DelayedEvent:
-#     def __init__(self, event, event_time):
-#         self.event = event
-#         self.event_time = event_time
+from scheduler import Scheduler
 
 
 class EventHandler:
     def __init__(self, game):
         self.game = game
         self.state_machine = state_machine.StateMachine(game)
-
-        # self.event_queue = []
+        # Events which happen at a known time, such as a boid getting hungry
+        self.scheduler = Scheduler()
 
         # TODO: Very easy to forget to add an event - any better solutions?
         self.active_events = {
@@ -44,8 +39,36 @@ class EventHandler:
                 Events.SHOUT
             ])
 
-    # def add_delayed_event(self, delay, event):
-    #     self.event_queue.append(Event(event))
+        # The time of day changes for the butterflies on every level, not just the leader's
+        self.time_of_day_events = {
+            Events.START_OF_SUNRISE,
+            Events.START_OF_SUNSET,
+            Events.START_OF_DAYTIME,
+            Events.START_OF_NIGHTTIME,
+        }
+
+    @property
+    def time(self):
+        """
+        Simulation time, in seconds, which timed events are scheduled against
+        """
+        return self.scheduler.time
+
+    def schedule(self, delay, action, *args):
+        """
+        Run action(*args) delay seconds from now, returning the timer, which can be passed to cancel
+        """
+        return self.scheduler.schedule(self.scheduler.time + delay, action, *args)
+
+    def cancel(self, timer):
+        if timer is not None:
+            self.scheduler.cancel(timer)
+
+    def advance(self, duration):
+        """
+        Move simulation time on by duration seconds, running whatever became due
+        """
+        self.scheduler.advance(duration)
 
     def activate(self, events):
         self.active_events.update(events)
@@ -68,7 +91,7 @@ class EventHandler:
             return
 
         leader.flock.level.flowers.append(
-            Flower(self.game, leader.location, age=-Settings.flower_seed_period)
+            Flower(self.game, leader.location, age=-Settings.flower_seed_period, level=leader.flock.level)
         )
 
     def handle_through_gate(self, boid, target_level, target_position):
@@ -77,11 +100,11 @@ class EventHandler:
             target_level.flock.leader = boid
             target_level.leader_enters()
 
-        boid.flock.boids.remove(boid)
-        target_level.flock.boids.append(boid)
-        boid.flock = target_level.flock
+        boid.flock.remove_boid(boid)
+        target_level.flock.add_boid(boid)
 
         boid.location = target_position + boid.velocity.normalize() * Settings.gate_radius * 2.5
+        boid.previous_location = boid.location
 
     def handle_through_exit_gate(self, boid):
         if not boid.flock.level.exit_gate_open:
@@ -124,6 +147,12 @@ class EventHandler:
         elif key == pygame.K_p:
             self.handle_event(Events.PLANT_FLOWER, self.game.level.flock.leader)
 
+        elif key == pygame.K_F3:
+            self.game.profiler.toggle()
+
+        elif key == pygame.K_F4:
+            self.game.dump_event_trace()
+
         # TODO: Tidy this up - should go in the event handler
         elif key == pygame.K_h:
             self.game.state = GameState.HELP
@@ -133,10 +162,12 @@ class EventHandler:
 
     def handle_event(self, event, boid=None):
         if event not in self.active_events:
-            logger.debug(f'Ignored event {event}')
             return
 
-        logger.debug(f'Handling event {event}')
+        if event in self.time_of_day_events and boid is None:
+            for level in self.game.levels:
+                self.state_machine.handle_event(event, flock=level.flock)
+            return
 
         # Todo: just pass through all?
         if event in [
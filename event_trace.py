@@ -0,0 +1,74 @@
+import struct
+import sys
+
+# Each record is one row of these fields, as 64 bit signed integers
+FIELDS = 'tick', 'boid_id', 'event', 'old_state', 'new_state'
+RECORD = struct.Struct(f'<{len(FIELDS)}q')
+# In place of a boid id: a batch transition, which moved every boid in old_state at once
+ALL_BOIDS = -1
+# In place of the new state: the boid had no transition for the event
+NO_TRANSITION = -1
+
+
+class EventTrace:
+    """
+    The most recent state machine events, in a fixed size ring buffer
+
+    Each event is recorded as (tick, boid id, event, old state code, new state code), packed straight into a
+    buffer of integers, so keeping the trace costs one call rather than formatting a message
+    dump writes the records, oldest first, to a file which read and python event_trace.py can turn back into names
+    """
+    def __init__(self, size):
+        self.size = size
+        self._records = bytearray(RECORD.size * size)
+        # Number of records ever added, so the next one goes in row _count % size
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.size)
+
+    def record(self, tick, boid_id, event, old_state, new_state):
+        if not self.size:
+            return
+
+        RECORD.pack_into(self._records, self._count % self.size * RECORD.size, tick, boid_id, event, old_state, new_state)
+        self._count += 1
+
+    def records(self):
+        """
+        The records as tuples, oldest first
+        """
+        start = self._count % self.size if self._count > self.size else 0
+        rows = [(start + i) % self.size for i in range(len(self))]
+        return [RECORD.unpack_from(self._records, row * RECORD.size) for row in rows]
+
+    def dump(self, path):
+        with open(path, 'wb') as trace_file:
+            trace_file.write(b''.join(RECORD.pack(*record) for record in self.records()))
+
+
+def read(path):
+    """
+    The records in a file written by EventTrace.dump, as tuples
+    """
+    with open(path, 'rb') as trace_file:
+        return list(RECORD.iter_unpack(trace_file.read()))
+
+
+def describe(record):
+    from enums import Events
+    from states import states
+
+    tick, boid_id, event, old_state, new_state = record
+    return '{} {} {}: {} -> {}'.format(
+        tick,
+        'all boids' if boid_id == ALL_BOIDS else f'boid {boid_id}',
+        Events(event).name,
+        states.by_code[old_state],
+        'no transition' if new_state == NO_TRANSITION else states.by_code[new_state],
+    )
+
+
+if __name__ == '__main__':
+    for trace_record in read(sys.argv[1]):
+        print(describe(trace_record))
@@ -1,11 +1,37 @@
+import collections
 import random
+import time
 
 import pygame
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import boid
 from obstacle import Obstacle
 import forces
 from settings import Settings
+from spatial_hash import SpatialHash
+from flock_store import FlockStore
+from states import states
+from enums import Events
+
+
+class Neighbourhood:
+    """
+    Totals used by the separation, alignment and cohesion forces for one boid
+    """
+    def __init__(self, boid):
+        self.boid = boid
+        self.separation_total = pygame.Vector2(0, 0)
+        self.separation_count = 0
+        # The leader counts Settings.leader_weighing_factor times for alignment and cohesion
+        self.alignment_total = pygame.Vector2(0, 0)
+        self.alignment_weight = 0
+        self.cohesion_total = pygame.Vector2(0, 0)
+        self.cohesion_weight = 0
 
 
 class Flock:
@@ -25,7 +51,7 @@ class Flock:
         #     for i in range(5)
         # ]
 
-        self.obstacles = []
+        self.obstacles = level.obstacles
 
         self.forces = {
             'Separation': forces.SeparationForce(self, 8, 50),
@@ -35,15 +61,23 @@ class Flock:
             'Obstacles': forces.ObstacleAvoidanceForce(self, 0.3, 400, self.obstacles),
             'LandingGravity': forces.GravityLandingForce(self, 10),
             'Attractor': forces.AttractorForce(self),
-            'Hunger': forces.HungerForce(self, 550, self.game.food_sources),
+            'Hunger': forces.HungerForce(self, 550, level.food_sources),
             # 'Wind': SteadyForceRule(self, pygame.Vector2(50, 0)),
             # 'Attractors': AttractorsRule(self, 1, [Attractor((300, 300), 50)]),
         }
 
-        self._distances = {}
+        self._index = SpatialHash(1)
+        self._neighbour_distance = 0
         self._neighbours = {}
+        self._neighbourhood = None
+        # With a FlockStore: the neighbours as arrays, from FlockStore.neighbour_pairs, and their totals
+        self._neighbour_pairs = None
+        self._neighbourhood_totals = None
         self.boids = []
+        # The boids in each state, as dicts with no values: sets which keep the boids in the order they arrived
+        self.members = collections.defaultdict(dict)
         self.leader = None
+        self.store = FlockStore() if Settings.use_flock_arrays else None
 
     @property
     def active_forces(self):
@@ -65,62 +99,163 @@ class Flock:
     #         )
 
     def calculate_distances(self):
-        self._distances = {}
-        for a in self.boids:
-            for b in self.boids:
-                if (a, b) in self._distances:
-                    continue
-
-                if a == b:
-                    self._distances[(a, b)] = 0
-                    continue
-
-                distance = a.location.distance_to(b.location)
-                self._distances[(a, b)] = distance
-                self._distances[(b, a)] = distance
+        """
+        Rebuild the spatial index of boid locations
+        Cells are as large as the largest active force distance, so all neighbours are in adjacent cells
+        """
+        self._neighbour_distance = max((rule.distance for rule in self.active_forces), default=0)
+        self._index = SpatialHash(max(self._neighbour_distance, 1))
+        for i, boid in enumerate(self.boids):
+            self._index.insert(i, boid.location)
 
     def calculate_neighbours(self):
-        maximum_distance = max(rule.distance for rule in self.active_forces)
+        maximum_distance = self._neighbour_distance
+        self._neighbourhood = None
+        self._neighbourhood_totals = None
+
+        if self.store is not None:
+            # The per boid lists are only built if something asks for them
+            self._neighbour_pairs = self.store.neighbour_pairs(self._index, maximum_distance)
+            self._neighbours = None
+            return
 
         self._neighbours = {}
-        for a in self.boids:
-            self._neighbours[a] = [
-                boid
-                for boid in self.boids
-                if boid is not a and self._distances[(a, boid)] < maximum_distance
-            ]
+        for i, a in enumerate(self.boids):
+            # Sorted, so neighbours are in flock order
+            neighbours = []
+            for j in sorted(self._index.nearby(a.location, maximum_distance)):
+                if j == i:
+                    continue
+
+                boid = self.boids[j]
+                distance = a.location.distance_to(boid.location)
+                if distance < maximum_distance:
+                    neighbours.append((boid, distance))
+            self._neighbours[a] = neighbours
 
-    def weighted_leader(boids, factor):
+    def neighbourhood(self, boid):
         """
-        Count the leader multiple times
+        Separation, alignment and cohesion totals for boid, gathered in a single pass over its neighbours
+        Only the totals for active forces are gathered, each within that force's own distance
+        The most recent result is kept, so the three forces share one pass per boid
         """
-        result = []
-        for boid in boids:
-            if boids.is_leader:
-                result += [boid] * factor
-            else:
-                result.append(boid)
+        if self._neighbourhood is not None and self._neighbourhood.boid is boid:
+            return self._neighbourhood
+
+        result = Neighbourhood(boid)
+        active_forces = self.game.active_forces
+        separation_distance = self.forces['Separation'].distance if 'Separation' in active_forces else -1
+        alignment_distance = self.forces['Alignment'].distance if 'Alignment' in active_forces else -1
+        cohesion_distance = self.forces['Cohesion'].distance if 'Cohesion' in active_forces else -1
+        leader = self.leader
+
+        for neighbour, distance in self.neighbour_distances(boid):
+            if distance <= separation_distance or distance <= cohesion_distance:
+                location = neighbour.location
+                if distance <= separation_distance:
+                    result.separation_total += location
+                    result.separation_count += 1
+                if distance <= cohesion_distance:
+                    if neighbour is leader:
+                        result.cohesion_total += location * Settings.leader_weighing_factor
+                        result.cohesion_weight += Settings.leader_weighing_factor
+                    else:
+                        result.cohesion_total += location
+                        result.cohesion_weight += 1
+            if distance <= alignment_distance:
+                if neighbour is leader:
+                    result.alignment_total += neighbour.velocity * Settings.leader_weighing_factor
+                    result.alignment_weight += Settings.leader_weighing_factor
+                else:
+                    result.alignment_total += neighbour.velocity
+                    result.alignment_weight += 1
 
+        self._neighbourhood = result
         return result
 
-    def neighbours(self, boid, maximum_distance, weighted_leader=False):
-        result = []
-        for neighbour in self._neighbours[boid]:
-            if self._distances[(boid, neighbour)] > maximum_distance:
-                continue
+    def neighbourhood_totals(self):
+        """
+        The totals of neighbourhood for every boid at once, as arrays with a row per boid, when there is a FlockStore
+        Gathered once per update, for all the forces which are applied with Force.apply_all
+        """
+        if self._neighbourhood_totals is None:
+            active_forces = self.game.active_forces
+            weights = numpy.ones(len(self.boids))
+            if self.leader is not None and self.leader.flock is self:
+                weights[self.leader.slot] = Settings.leader_weighing_factor
+            self._neighbourhood_totals = self.store.neighbourhood_totals(
+                self._neighbour_pairs,
+                weights,
+                self.forces['Separation'].distance if 'Separation' in active_forces else -1,
+                self.forces['Alignment'].distance if 'Alignment' in active_forces else -1,
+                self.forces['Cohesion'].distance if 'Cohesion' in active_forces else -1,
+            )
+        return self._neighbourhood_totals
 
-            if weighted_leader and neighbour.is_leader:
-                result += [neighbour] * Settings.leader_weighing_factor
-            else:
-                result.append(neighbour)
+    def neighbour_distances(self, boid):
+        """
+        (neighbour, distance) for each of boid's neighbours, in flock order
+        """
+        if self._neighbours is None:
+            self._neighbours = self.store.neighbours(self._neighbour_pairs)
+        return self._neighbours.get(boid, [])
 
-        return result
+    def neighbours(self, boid, maximum_distance):
+        return [
+            neighbour
+            for neighbour, distance in self.neighbour_distances(boid)
+            if distance <= maximum_distance
+        ]
 
-        # return [
-        #     neighbour
-        #     for neighbour in self._neighbours[boid]
-        #     if self._distances[(boid, neighbour)] <= maximum_distance
-        # ]
+    def food_levels(self):
+        """
+        Boid.food for every row of the store at once
+        """
+        store = self.store
+        rates = numpy.array([state.food_rate for state in states.by_code]) + (-1 if self.game.boids_need_food else 0)
+        return store.food + rates[store.states] * (self.game.event_handler.time - store.food_times)
+
+    def state_changed(self, boid, old_state, new_state):
+        members = self.members.get(old_state)
+        if members is not None and boid in members:
+            del members[boid]
+            self.members[new_state][boid] = None
+
+    def states_changed(self, rows, old_state, new_state):
+        """
+        All boids in old_state, in rows of the store, were moved to new_state at once
+        """
+        self.members[new_state].update(self.members.pop(old_state))
+
+        # Boids which are already hungry only have a starving event to come if their state can act on it
+        if Events.STARVING in new_state.transitions and Events.STARVING not in old_state.transitions:
+            store = self.store
+            now = self.game.event_handler.time
+            rate = (-1 if self.game.boids_need_food else 0) + new_state.food_rate
+            food = store.food[rows] + rate * (now - store.food_times[rows])
+            for row in rows[food <= Settings.boid_hungry_level]:
+                store.boids[row].schedule_food_event()
+
+    def add_boid(self, boid):
+        boid.flock = self
+        self.boids.append(boid)
+        if self.store is not None:
+            boid.attach(self.store)
+        self.members[boid.state][boid] = None
+
+    def remove_boid(self, boid):
+        self.boids.remove(boid)
+        del self.members[boid.state][boid]
+        if self.store is not None:
+            boid.detach()
+            self.store.remove([boid])
+
+    def remove_all_boids(self):
+        self.members.clear()
+        if self.store is not None:
+            [boid.detach() for boid in self.boids]
+            self.store.remove(self.boids)
+        self.boids = []
 
     def make_babies(self, location):
         for _ in range(random.randint(Settings.minimum_number_of_babies, Settings.maximum_number_of_babies)):
@@ -128,28 +263,138 @@ class Flock:
                 location.y + random.randint(-Settings.maximum_baby_distance, Settings.maximum_baby_distance),
                 location.x + random.randint(-Settings.maximum_baby_distance, Settings.maximum_baby_distance),
             )
-            self.boids.append(boid.Boid(self, location=baby_location, velocity=pygame.Vector2(0, -3), age=0))
+            self.add_boid(boid.Boid(self, location=baby_location, velocity=pygame.Vector2(0, -3), age=0))
+
+    @property
+    def is_resting(self):
+        """
+        None of the boids are moving: they are all landed, asleep or feeding
+        """
+        return all(boid.state in (states.LANDED, states.SLEEPING, states.FEEDING) for boid in self.boids)
 
-    def update(self, duration):
-        self.calculate_distances()
-        self.calculate_neighbours()
+    def apply_forces_profiled(self, duration, profiler, force_names):
+        """
+        Same as the force loop in update, but timing each force
+        """
+        perf_counter = time.perf_counter
         for boid in self.boids:
-            for force in self.active_forces:
-                force.apply(boid, duration)
-            # for rule in self.rules.values():
-            #     rule.apply(boid, duration)
-        [boid.update(duration) for boid in self.boids]
+            for force_name in force_names:
+                start = perf_counter()
+                self.forces[force_name].apply(boid, duration)
+                profiler.add(f'{force_name} force', perf_counter() - start)
+            boid.apply_net_force()
+
+    def apply_forces_to_store(self, duration, profiler, force_names):
+        """
+        The force loop in update, when there is a FlockStore: each force adds to the net force of every boid at once,
+        then they are all applied in one go
+        All boids see their neighbours' velocities from before this update, rather than some seeing the velocities
+        the boids before them in the flock have just been given
+        Boid.apply_force is followed, with each boid's mass taken as 1
+        """
+        store = self.store
+        net_forces = numpy.zeros((len(self.boids), 2))
+        for force_name in force_names:
+            with profiler.phase(f'{force_name} force'):
+                self.forces[force_name].apply_all(duration, net_forces)
+
+        with profiler.phase('Flock.apply_net_forces'):
+            maximum_speeds = numpy.full(len(self.boids), float(Settings.boid_maximum_speed))
+            if self.leader is not None and self.leader.flock is self:
+                maximum_speeds[self.leader.slot] *= self.leader.leader_speed_multiplier
+            store.apply_net_forces(net_forces, maximum_speeds, store.states == states.LANDING.code)
+
+    def update_store(self, duration):
+        """
+        Boid.update for every boid, when there is a FlockStore
+        Moving and ageing are done as array operations, and only the boids which might have an event - hungry ones,
+        those near the exit gate, the leader and those crossing into or out of the landing zone - are looked at one
+        by one
+        """
+        store = self.store
+        store.previous_positions[:] = store.positions
+
+        for boid in list(self.members.get(states.HUNGRY, ())):
+            boid.check_food_sources()
+
+        store.ages[:] += duration
+        resting = numpy.isin(store.states, [states.LANDED.code, states.SLEEPING.code, states.FEEDING.code])
+        store.positions[~resting] += store.velocities[~resting] * duration
+
+        positions = store.positions
+        level = self.level
+        candidates = (positions[:, 1] > level.landing_zone_top) != store.in_landing_zone
+        if level.exit_gate_position is not None:
+            offsets = positions - numpy.array(level.exit_gate_position)
+            candidates |= numpy.hypot(offsets[:, 0], offsets[:, 1]) <= Settings.gate_radius
+        if self.leader is not None and self.leader.flock is self:
+            candidates[self.leader.slot] = True
+
+        for boid in [self.boids[row] for row in numpy.flatnonzero(candidates).tolist()]:
+            boid.check_exit_gate()
+            boid.check_entrance_gate()
+            boid.check_landing_zone()
+
+    def update(self, duration, flocking=True):
+        """
+        flocking: when False, the neighbour search and the forces which need neighbours are skipped
+        """
+        profiler = self.game.profiler
+        force_names = self.game.active_forces
+        if flocking:
+            with profiler.phase('Flock.calculate_distances'):
+                self.calculate_distances()
+            with profiler.phase('Flock.calculate_neighbours'):
+                self.calculate_neighbours()
+        else:
+            force_names = [name for name in force_names if not self.forces[name].uses_neighbours]
+
+        if self.store is not None:
+            self.apply_forces_to_store(duration, profiler, force_names)
+        elif profiler.enabled:
+            self.apply_forces_profiled(duration, profiler, force_names)
+        else:
+            active_forces = [self.forces[name] for name in force_names]
+            for boid in self.boids:
+                for force in active_forces:
+                    force.apply(boid, duration)
+                boid.apply_net_force()
+                # for rule in self.rules.values():
+                #     rule.apply(boid, duration)
+        with profiler.phase('Boid.update'):
+            if self.store is not None:
+                self.update_store(duration)
+            else:
+                [boid.update(duration) for boid in self.boids]
         # angle, speed = self.leader.velocity.as_polar()
         # print(int(angle), int(speed))
 
         # Remove deceased boids
+        deceased = [boid for boid in self.boids if not boid.alive]
         self.boids = [boid for boid in self.boids if boid.alive]
+        for boid in deceased:
+            del self.members[boid.state][boid]
+        if self.store is not None and deceased:
+            [boid.detach() for boid in deceased]
+            self.store.remove(deceased)
         if self.leader and not self.leader.alive:
             if self.boids:
                 self.leader = random.choice(self.boids)
 
-    def draw(self):
-        [boid.draw() for boid in self.boids]
+    def draw(self, interpolation=1):
+        """
+        All butterflies, then their status icons grouped by state, in a single Surface.blits call
+        """
+        butterflies = []
+        icons = collections.defaultdict(list)
+        for boid in self.boids:
+            sprites = boid.sprites(interpolation)
+            butterflies.append(sprites[0])
+            if len(sprites) > 1:
+                icons[boid.state].append(sprites[1])
+        for group in icons.values():
+            butterflies.extend(group)
+        self.canvas.blits(butterflies, doreturn=False)
 
         # [
         #     item.draw(self.canvas)
@@ -0,0 +1,194 @@
+import types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FlockStore:
+    """
+    Struct-of-arrays storage for the boids in a flock
+
+    Row i holds the location, previous location, velocity, food and when it was set, state code, death time, age
+    and whether it is in the landing zone of boids[i], in the same order as Flock.boids, so whole-flock
+    calculations can be done as array operations
+    Boids read and write their own row through the Boid properties of the same names, where the death time of a
+    boid which isn't dying is NaN
+    """
+    COLUMNS = (
+        '_positions', '_previous_positions', '_velocities', '_food', '_food_times', '_states', '_death_times',
+        '_ages', '_in_landing_zone',
+    )
+
+    def __init__(self, capacity=64):
+        if numpy is None:
+            raise ImportError('numpy is needed for the array-backed flock store')
+
+        self.boids = []
+        self._positions = numpy.zeros((capacity, 2))
+        self._previous_positions = numpy.zeros((capacity, 2))
+        self._velocities = numpy.zeros((capacity, 2))
+        self._food = numpy.zeros(capacity)
+        self._food_times = numpy.zeros(capacity)
+        self._states = numpy.zeros(capacity, dtype=numpy.int8)
+        self._death_times = numpy.full(capacity, numpy.nan)
+        self._ages = numpy.zeros(capacity)
+        self._in_landing_zone = numpy.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.boids)
+
+    @property
+    def positions(self):
+        return self._positions[:len(self.boids)]
+
+    @property
+    def previous_positions(self):
+        return self._previous_positions[:len(self.boids)]
+
+    @property
+    def velocities(self):
+        return self._velocities[:len(self.boids)]
+
+    @property
+    def food(self):
+        return self._food[:len(self.boids)]
+
+    @property
+    def food_times(self):
+        return self._food_times[:len(self.boids)]
+
+    @property
+    def states(self):
+        return self._states[:len(self.boids)]
+
+    @property
+    def death_times(self):
+        return self._death_times[:len(self.boids)]
+
+    @property
+    def ages(self):
+        return self._ages[:len(self.boids)]
+
+    @property
+    def in_landing_zone(self):
+        return self._in_landing_zone[:len(self.boids)]
+
+    def _grow(self):
+        capacity = len(self._food) * 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, boid):
+        """
+        Add a row for boid, at the end, and set boid.slot to its index
+        The caller is responsible for filling in the row
+        """
+        if len(self.boids) == len(self._food):
+            self._grow()
+        boid.slot = len(self.boids)
+        self.boids.append(boid)
+
+    def remove(self, boids):
+        """
+        Remove the rows for boids, shifting the remaining rows up to keep them in order
+        """
+        boids = set(boids)
+        keep = numpy.array([boid not in boids for boid in self.boids], dtype=bool)
+        size = int(keep.sum())
+        for name in self.COLUMNS:
+            array = getattr(self, name)
+            array[:size] = array[:len(self.boids)][keep]
+
+        self.boids = [boid for boid in self.boids if boid not in boids]
+        for slot, boid in enumerate(self.boids):
+            boid.slot = slot
+
+    def neighbour_pairs(self, index, maximum_distance):
+        """
+        Every pair of rows closer than maximum_distance, as three arrays: row, neighbour row and distance
+        Sorted by row, then neighbour row, so each row's neighbours are in flock order
+        index must be a SpatialHash of row numbers, with cells at least maximum_distance wide
+        Distances are calculated for one cell at a time, against all rows in the cells around it
+        """
+        positions = self.positions
+        rows, neighbour_rows, distances = [], [], []
+        for cell, members in index.cells():
+            members = numpy.array(members)
+            candidates = numpy.array(sorted(index.around(cell)))
+
+            deltas = positions[candidates][numpy.newaxis, :, :] - positions[members][:, numpy.newaxis, :]
+            cell_distances = numpy.hypot(deltas[:, :, 0], deltas[:, :, 1])
+            close = (cell_distances < maximum_distance) & (candidates[numpy.newaxis, :] != members[:, numpy.newaxis])
+
+            member_rows, candidate_rows = numpy.nonzero(close)
+            rows.append(members[member_rows])
+            neighbour_rows.append(candidates[candidate_rows])
+            distances.append(cell_distances[close])
+
+        if not rows:
+            return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int), numpy.zeros(0)
+        rows, neighbour_rows, distances = numpy.concatenate(rows), numpy.concatenate(neighbour_rows), \
+            numpy.concatenate(distances)
+        order = numpy.lexsort((neighbour_rows, rows))
+        return rows[order], neighbour_rows[order], distances[order]
+
+    def neighbours(self, pairs):
+        """
+        For each boid, the (neighbour, distance) pairs from neighbour_pairs, in flock order
+        """
+        result = {boid: [] for boid in self.boids}
+        boids = self.boids
+        for i, j, distance in zip(*(column.tolist() for column in pairs)):
+            result[boids[i]].append((boids[j], distance))
+        return result
+
+    def neighbourhood_totals(self, pairs, weights, separation_distance, alignment_distance, cohesion_distance):
+        """
+        The totals of Flock.neighbourhood for every row at once, as arrays with a row per boid
+        weights is the weight of each row for alignment and cohesion
+        A distance of -1 leaves that force's totals at zero
+        """
+        rows, neighbour_rows, distances = pairs
+        size = len(self.boids)
+
+        def total(close, values, weighted):
+            row, neighbour_row = rows[close], neighbour_rows[close]
+            weight = weights[neighbour_row] if weighted else numpy.ones(len(row))
+            values = values[neighbour_row] * weight[:, numpy.newaxis]
+            return (
+                numpy.stack([
+                    numpy.bincount(row, values[:, 0], minlength=size),
+                    numpy.bincount(row, values[:, 1], minlength=size)
+                ], axis=1),
+                numpy.bincount(row, weight, minlength=size)
+            )
+
+        totals = types.SimpleNamespace()
+        totals.separation_total, totals.separation_count = total(
+            distances <= separation_distance, self.positions, False
+        )
+        totals.alignment_total, totals.alignment_weight = total(
+            distances <= alignment_distance, self.velocities, True
+        )
+        totals.cohesion_total, totals.cohesion_weight = total(distances <= cohesion_distance, self.positions, True)
+        return totals
+
+    def apply_net_forces(self, net_forces, maximum_speeds, no_upward_force):
+        """
+        Boid.apply_force for every row at once, with each boid's mass taken as 1
+        Rows without a force are left as they are, as are rows in no_upward_force which the force would make go up
+        Speeds are then limited to maximum_speeds
+        """
+        velocities = self.velocities
+        new_velocities = velocities + net_forces
+        changed = numpy.any(net_forces != 0, axis=1) & ~(no_upward_force & (new_velocities[:, 1] < 0))
+
+        speeds = numpy.hypot(new_velocities[:, 0], new_velocities[:, 1])
+        too_fast = speeds > maximum_speeds
+        new_velocities[too_fast] *= (maximum_speeds[too_fast] / speeds[too_fast])[:, numpy.newaxis]
+        velocities[changed] = new_velocities[changed]
@@ -1,21 +1,26 @@
 import pygame
 
 from settings import Settings
+from assets import assets
 from food_source import FoodSource
 from obstacle import Obstacle
 
 
 class Flower:
-    _flower_image = pygame.image.load('images/yellow-flower.png')
-    _flower_rect = _flower_image.get_rect()
-    seed_image = pygame.image.load('images/seed.png')
-    seed_rect = seed_image.get_rect()
+    # Scaled images of a growing flower, by growth step, shared by all flowers on all levels
+    _growth_frames = {}
 
-    def __init__(self, game, location, age=-Settings.flower_seed_period):
+    def __init__(self, game, location, age=-Settings.flower_seed_period, level=None):
+        self._flower_image = assets.image('images', 'yellow-flower.png')
+        self._flower_rect = self._flower_image.get_rect()
+        self.seed_image = assets.image('images', 'seed.png')
+        self.seed_rect = self.seed_image.get_rect()
         self.age = age
         self.location = pygame.Vector2(location)
         self.game = game
         self.canvas = game.canvas
+        # The level the flower grows on, which gets its food source and obstacle
+        self.level = level
 
     def update(self, duration):
         if self.age >= Settings.flower_adult_age:
@@ -28,7 +33,7 @@ class Flower:
             location = self.location + Settings.flower_food_source_offset
             radius = Settings.flower_food_source_radius
             weight = Settings.flower_food_source_weight
-            self.game.food_sources.append(
+            self.level.food_sources.add(
                 FoodSource(
                     location=location,
                     radius=radius,
@@ -38,28 +43,35 @@ class Flower:
                 )
             )
 
-            # TODO: Tidy up?
-            for level in self.game.levels:
-                level.flock.obstacles.append(
-                    Obstacle(location, radius, 1)
-                )
-
-    def draw(self):
-        if self.age < 0:
-            # Draw seed
-            self.seed_rect.midbottom = self.location
-            self.canvas.blit(self.seed_image, self.seed_rect)
-            return
+            self.level.obstacles.add(Obstacle(location, radius, 1))
 
-        # Draw flower
-        scaling_factor = max(self.age / Settings.flower_adult_age, 0.1)
-        if scaling_factor < 0.97:
+    def growth_frame(self, scaling_factor):
+        """
+        The flower image scaled down to scaling_factor, rounded down to one of Settings.flower_growth_frames sizes
+        """
+        minimum, maximum = Settings.flower_minimum_scale, Settings.flower_full_size_scale
+        step = int((scaling_factor - minimum) / (maximum - minimum) * Settings.flower_growth_frames)
+        image = self._growth_frames.get(step)
+        if image is None:
+            scaling_factor = minimum + step * (maximum - minimum) / Settings.flower_growth_frames
             size = int(self._flower_rect.width * scaling_factor), int(self._flower_rect.height * scaling_factor)
             image = pygame.transform.scale(self._flower_image, size)
-            rect = image.get_rect()
+            self._growth_frames[step] = image
+        return image
+
+    def sprite(self):
+        """
+        The seed or flower image for the current age, and where it goes
+        """
+        if self.age < 0:
+            return self.seed_image, self.seed_image.get_rect(midbottom=self.location)
+
+        scaling_factor = max(self.age / Settings.flower_adult_age, Settings.flower_minimum_scale)
+        if scaling_factor < Settings.flower_full_size_scale:
+            image = self.growth_frame(scaling_factor)
         else:
-            rect = self._flower_rect
             image = self._flower_image
+        return image, image.get_rect(midbottom=self.location)
 
-        rect.midbottom = self.location
-        self.canvas.blit(image, rect)
+    def draw(self):
+        self.canvas.blit(*self.sprite())
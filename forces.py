@@ -1,11 +1,14 @@
 import logging
-import random
 import abc
 
 import pygame
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 import enums
-import utilities
 from settings import Settings
 from states import states
 
@@ -13,6 +16,9 @@ logger = logging.getLogger(__name__)
 
 
 class Force(abc.ABC):
+    # Forces which use Flock.neighbourhood need the neighbours calculated first
+    uses_neighbours = False
+
     def __init__(self, flock, weight=1.0, distance=0):
         self.flock = flock
         self.weight = weight
@@ -22,28 +28,47 @@ class Force(abc.ABC):
     def apply(self, boid, duration):
         pass
 
+    def apply_all(self, duration, net_forces):
+        """
+        apply for every boid at once, when the flock has a FlockStore, adding to row i of net_forces for boids[i]
+        By default this calls apply for each boid, so forces can be vectorised one at a time
+        """
+        for boid in self.flock.boids:
+            self.apply(boid, duration)
+            if boid.net_force:
+                net_forces[boid.slot] += boid.net_force
+                boid.net_force = pygame.Vector2(0, 0)
+
 
 class SeparationForce(Force):
     help_text = 'keep a little bit of a distance'
+    uses_neighbours = True
 
     def apply(self, boid, duration):
         """
            Steer to avoid crowding local flockmates
            Force = -(vector to centre (average location) of neighbours)
         """
-        neighbours = self.flock.neighbours(boid, self.distance)
-        if not len(neighbours):
+        neighbourhood = self.flock.neighbourhood(boid)
+        if not neighbourhood.separation_count:
             return
 
-        centre = utilities.point_centre(neighbour.location for neighbour in neighbours)
+        centre = neighbourhood.separation_total / neighbourhood.separation_count
 
-        boid.apply_force(
+        boid.add_force(
             (boid.location - centre) * self.weight * duration
         )
 
+    def apply_all(self, duration, net_forces):
+        totals = self.flock.neighbourhood_totals()
+        rows = totals.separation_count > 0
+        centres = totals.separation_total[rows] / totals.separation_count[rows, numpy.newaxis]
+        net_forces[rows] += (self.flock.store.positions[rows] - centres) * self.weight * duration
+
 
 class AlignmentForce(Force):
     help_text = 'fly in the same direction as their neighbours, especially the leader'
+    uses_neighbours = True
 
     def apply(self, boid, duration):
         """
@@ -51,19 +76,26 @@ class AlignmentForce(Force):
             (Average velocity) * x% (suggested: 12.5% - 1/8)
             To keep it simple, use the previous heading
         """
-        neighbours = self.flock.neighbours(boid, self.distance, weighted_leader=True)
-        if not len(neighbours):
+        neighbourhood = self.flock.neighbourhood(boid)
+        if not neighbourhood.alignment_weight:
             return
 
-        average_velocity = utilities.average_velocity(neighbour.velocity for neighbour in neighbours)
+        average_velocity = neighbourhood.alignment_total / neighbourhood.alignment_weight
 
-        boid.apply_force(
+        boid.add_force(
             average_velocity * self.weight * duration
         )
 
+    def apply_all(self, duration, net_forces):
+        totals = self.flock.neighbourhood_totals()
+        rows = totals.alignment_weight > 0
+        average_velocities = totals.alignment_total[rows] / totals.alignment_weight[rows, numpy.newaxis]
+        net_forces[rows] += average_velocities * self.weight * duration
+
 
 class CohesionForce(Force):
     help_text = 'join their neighbours'
+    uses_neighbours = True
 
     def apply(self, boid, duration):
         """
@@ -71,16 +103,22 @@ class CohesionForce(Force):
             Average location (centre) of neighbouring boids, move x% (suggested: 1%) towards the centre.
         """
 
-        neighbours = self.flock.neighbours(boid, self.distance, weighted_leader=True)
-        if not len(neighbours):
+        neighbourhood = self.flock.neighbourhood(boid)
+        if not neighbourhood.cohesion_weight:
             return
 
-        centre = utilities.point_centre(neighbour.location for neighbour in neighbours)
+        centre = neighbourhood.cohesion_total / neighbourhood.cohesion_weight
 
-        boid.apply_force(
+        boid.add_force(
             (centre - boid.location) * self.weight * duration
         )
 
+    def apply_all(self, duration, net_forces):
+        totals = self.flock.neighbourhood_totals()
+        rows = totals.cohesion_weight > 0
+        centres = totals.cohesion_total[rows] / totals.cohesion_weight[rows, numpy.newaxis]
+        net_forces[rows] += (centres - self.flock.store.positions[rows]) * self.weight * duration
+
 
 class BoundaryBoxForce(Force):
     def __init__(self, flock, weight, distance, box_size):
@@ -94,28 +132,34 @@ class BoundaryBoxForce(Force):
 
         # Too far left
         if boid.location.x < self.distance:
-            boid.apply_force(
+            boid.add_force(
                 pygame.Vector2(self.weight, 0)
             )
 
         # Too far right
         if boid.location.x > self.box_size.x - self.distance:
-            boid.apply_force(
+            boid.add_force(
                 pygame.Vector2(-self.weight, 0)
             )
 
         # Too high
         if boid.location.y < self.distance:
-            boid.apply_force(
+            boid.add_force(
                 pygame.Vector2(0, self.weight)
             )
 
         # Too far down
         if boid.location.y > self.box_size.y - self.distance:
-            boid.apply_force(
+            boid.add_force(
                 pygame.Vector2(0, -self.weight)
             )
 
+    def apply_all(self, duration, net_forces):
+        positions = self.flock.store.positions
+        for axis, size in enumerate(self.box_size):
+            net_forces[:, axis] += self.weight * (positions[:, axis] < self.distance)
+            net_forces[:, axis] -= self.weight * (positions[:, axis] > size - self.distance)
+
 
 class ConstantForce(Force):
     def __init__(self, flock, force):
@@ -123,7 +167,10 @@ class ConstantForce(Force):
         self.force = force
 
     def apply(self, boid, duration):
-        boid.apply_force(self.force * duration)
+        boid.add_force(self.force * duration)
+
+    def apply_all(self, duration, net_forces):
+        net_forces += self.force * duration
 
 
 class AttractorForce(Force):
@@ -131,12 +178,17 @@ class AttractorForce(Force):
         super().__init__(flock, 0, 0)
 
     def apply(self, boid, duration):
+        for attractor in self.flock.level.attractors.containing(boid.location):
+            force = (attractor.location - boid.location).normalize() * attractor.weight
+            boid.add_force(force * duration)
+
+    def apply_all(self, duration, net_forces):
+        positions = self.flock.store.positions
         for attractor in self.flock.level.attractors:
-            if utilities.distance_between_points(
-                    boid.location, attractor.location
-            ) < attractor.distance:
-                force = (attractor.location - boid.location).normalize() * attractor.weight
-                boid.apply_force(force * duration)
+            offsets = numpy.array(attractor.location) - positions
+            distances = numpy.hypot(offsets[:, 0], offsets[:, 1])
+            rows = (distances < attractor.radius) & (distances > 0)
+            net_forces[rows] += offsets[rows] / distances[rows, numpy.newaxis] * attractor.weight * duration
 
 
 class HungerForce(Force):
@@ -149,28 +201,42 @@ class HungerForce(Force):
         if not boid.is_hungry:
             return
 
-        if not self.food_sources:
+        food_source = self.target(boid)
+        if food_source is None:
             return
 
-        # TODO: Re-introduce later
-        # food_sources = [
-        #     (utilities.distance_between_points(food_source.location, boid.location), food_source)
-        #     for food_source in self.food_sources
-        #     if food_source not in boid.exhausted_food_sources
-        # ]
+        force = (food_source.location - boid.location).normalize() * food_source.weight
+        # logger.debug(f'Hungry force applied: {force * duration}')
+        boid.add_force(force * duration)
 
-        # if not food_sources:
-        #     # food_source = random.choice(self.food_sources)
-        #     return
-        #
-        # food_sources.sort()
-        # food_source = food_sources[0][1]
+    def apply_all(self, duration, net_forces):
+        """
+        Only the hungry boids, found from the food column, are looked at one by one
+        """
+        boids = self.flock.boids
+        for row in numpy.flatnonzero(self.flock.food_levels() <= Settings.boid_hungry_level).tolist():
+            boid = boids[row]
+            food_source = self.target(boid)
+            if food_source is None:
+                continue
 
-        food_source = random.choice(self.food_sources)
+            force = (food_source.location - boid.location).normalize() * food_source.weight
+            net_forces[row] += force * duration
 
-        force = (food_source.location - boid.location).normalize() * food_source.weight
-        # logger.debug(f'Hungry force applied: {force * duration}')
-        boid.apply_force(force * duration)
+    def target(self, boid):
+        """
+        The food source boid is heading for
+        Only looked up again when it has been exhausted or the food sources have changed
+        """
+        food_source = boid.food_target
+        if food_source is None or boid.food_target_version != self.food_sources.version \
+                or food_source in boid.exhausted_food_sources:
+            food_source = self.food_sources.nearest(
+                boid.location, lambda food_source: food_source not in boid.exhausted_food_sources
+            )
+            boid.food_target = food_source
+            boid.food_target_version = self.food_sources.version
+        return food_source
 
 
 class ObstacleAvoidanceForce(Force):
@@ -179,10 +245,8 @@ class ObstacleAvoidanceForce(Force):
         self.obstacles = obstacles
 
     def apply(self, boid, duration):
-        for obstacle in self.obstacles:
+        for obstacle in self.obstacles.within(boid.location, self.distance):
             distance = (boid.location - obstacle.location).length()
-            if distance > self.distance:
-                continue
 
             # If we were to travel forward the same distance as that to the centre of the obstacle
             # how far are we from the obstacle?
@@ -193,7 +257,27 @@ class ObstacleAvoidanceForce(Force):
                 continue
 
             weight = obstacle.weight if obstacle.weight else self.weight
-            boid.apply_force(obstacle_centre_to_passing_point * weight * duration)
+            boid.add_force(obstacle_centre_to_passing_point * weight * duration)
+
+    def apply_all(self, duration, net_forces):
+        store = self.flock.store
+        positions, velocities = store.positions, store.velocities
+        speeds = numpy.hypot(velocities[:, 0], velocities[:, 1])
+        directions = numpy.divide(
+            velocities, speeds[:, numpy.newaxis], out=numpy.zeros_like(velocities), where=speeds[:, numpy.newaxis] > 0
+        )
+        for obstacle in self.obstacles:
+            offsets = positions - numpy.array(obstacle.location)
+            distances = numpy.hypot(offsets[:, 0], offsets[:, 1])
+            rows = numpy.flatnonzero(distances <= self.distance)
+            if not len(rows):
+                continue
+
+            # As in apply: how far from the obstacle the boid would pass, going on as far as it is from it now
+            passing_points = offsets[rows] + directions[rows] * distances[rows, numpy.newaxis]
+            close = numpy.hypot(passing_points[:, 0], passing_points[:, 1]) <= obstacle.radius * 1.5
+            weight = obstacle.weight if obstacle.weight else self.weight
+            net_forces[rows[close]] += passing_points[close] * weight * duration
 
 
 class GravityLandingForce(Force):
@@ -201,5 +285,8 @@ class GravityLandingForce(Force):
         super().__init__(flock, weight)
 
     def apply(self, boid, duration):
-        if boid.status == states.LANDING:
-            boid.apply_force(pygame.Vector2(0, Settings.gravity_velocity) * self.weight)
+        if boid.state == states.LANDING:
+            boid.add_force(pygame.Vector2(0, Settings.gravity_velocity) * self.weight)
+
+    def apply_all(self, duration, net_forces):
+        net_forces[self.flock.store.states == states.LANDING.code, 1] += Settings.gravity_velocity * self.weight
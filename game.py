@@ -1,7 +1,11 @@
+import contextlib
+import glob
+import logging
 import random
 import os
 import datetime
 import textwrap
+import time
 
 import pygame
 
@@ -10,26 +14,48 @@ from flower import Flower
 import utilities
 from event_handler import EventHandler
 from button import Button
+from profiler import Profiler
+from event_trace import EventTrace
+from assets import assets
+import sprite_cache
+from text_cache import TextCache
+from dirty_rects import DirtyRectRenderer
+from level_workers import LevelWorkers
 import enums
 from settings import Settings
 
+logger = logging.getLogger(__name__)
+
 # TODO: Remove this?
 random.seed(10)
 
 
 class Game:
     def __init__(self, canvas, starting_level):
+        # Without a canvas the game runs headless: simulation only, nothing is drawn
         self.canvas = canvas
+        self.headless = canvas is None
         self.clock = pygame.time.Clock()
-        self.images = self.load_images()
-        self.help_image = pygame.image.load(os.path.join('images', 'help.png'))
+        self.images = self.load_images() if not self.headless else {}
+        self.help_image = assets.image('images', 'help.png') if not self.headless else None
+        self.profiler = Profiler()
+        # Number of simulation steps so far, and the state machine events in the most recent ones
+        self.ticks = 0
+        self.event_trace = EventTrace(Settings.event_trace_size)
         self.event_handler = EventHandler(self)
-        self.boids_need_food = False
+        self._boids_need_food = False
         self.state = enums.GameState.READ_INTRO
         self.font = pygame.font.Font(
             os.path.join('fonts', 'Acme-Regular.ttf'),
             Settings.font_size
-        )
+        ) if not self.headless else None
+        self.text_cache = TextCache(self.font, Settings.text_cache_size) if not self.headless else None
+        self._text_key = None
+        self._text_surface = None
+        self.profiler_font = pygame.font.Font(
+            os.path.join('fonts', 'Acme-Regular.ttf'),
+            Settings.profiler_font_size
+        ) if not self.headless else None
 
         lines = """Your butterfly will be affected by the others around it and vice versa
         But you do have some control over it. And, as the leader, you have the most influence
@@ -48,8 +74,12 @@ class Game:
 
         self.time_keeper = None
         self.recent_buttons = {}
-
-        self.food_sources = []
+        # Seconds each background level is behind the current level, see simulate_background
+        self.background_lag = {}
+        self._background_turn = 0
+        # With level workers, the other levels are stepped in full, in parallel, instead of in the background
+        self.level_workers = LevelWorkers(self, Settings.level_workers) if Settings.level_workers else None
+        self.renderer = DirtyRectRenderer(self) if Settings.use_dirty_rects and not self.headless else None
 
         self.active_forces = {
             'Separation', 'Alignment', 'Cohesion', 'Boundaries', 'Attractor',
@@ -69,10 +99,9 @@ class Game:
 
         if starting_level > 0:
             # Move the flock to the starting level
-            for boid in self.levels[0].flock.boids:
-                self.level.flock.boids.append(boid)
-                boid.flock = self.level.flock
-            self.levels[0].flock.boids = []
+            for boid in list(self.levels[0].flock.boids):
+                self.levels[0].flock.remove_boid(boid)
+                self.level.flock.add_boid(boid)
             leader = self.levels[0].flock.leader
             self.levels[0].flock.leader = None
             self.level.flock.leader = leader
@@ -90,9 +119,11 @@ class Game:
         for name in 'help', 'pause', 'play':
             self.buttons[name].visible = False
 
+        logger.debug(f'Images loaded: {assets.report()}')
+
     def next_level(self, level):
         current_level_index = self.levels.index(level)
-        if current_level_index > len(self.levels):
+        if current_level_index >= len(self.levels) - 1:
             return None
 
         return self.levels[current_level_index + 1]
@@ -105,6 +136,27 @@ class Game:
 
         return self.levels[current_level_index - 1]
 
+    def load_level_images(self, level):
+        """
+        Make sure the images for the leader's level are loaded and start loading the next level's in the background
+        Then free the images of the levels furthest from the leader, until within Settings.level_image_memory_budget
+        """
+        if self.headless:
+            return
+
+        level.load_images()
+        next_level = self.next_level(level)
+        if next_level is not None:
+            next_level.prefetch_images()
+
+        level_index = self.levels.index(level)
+        furthest_first = sorted(self.levels, key=lambda other: abs(self.levels.index(other) - level_index), reverse=True)
+        for other in furthest_first:
+            if sum(each.image_memory for each in self.levels) <= Settings.level_image_memory_budget:
+                break
+            if other is not level and other is not next_level:
+                other.release_images()
+
     @property
     def leader(self):
         return self.level.flock.leader
@@ -113,18 +165,43 @@ class Game:
     def is_mating_season(self):
         return self.time_keeper.is_mating_season
 
+    @property
+    def boids_need_food(self):
+        return self._boids_need_food
+
+    @boids_need_food.setter
+    def boids_need_food(self, boids_need_food):
+        if boids_need_food == self._boids_need_food:
+            return
+
+        # Food gets used up at a different rate from now on, so bring each boid's food up to date first
+        boids = [(boid, boid.food) for level in self.levels for boid in level.flock.boids]
+        self._boids_need_food = boids_need_food
+        for boid, food in boids:
+            boid.food = food
+
     def handle_event(self, event, boid=None):
         self.event_handler.handle_event(event, boid)
 
     def load_images(self):
+        """
+        Butterfly sprites for every angle, from the sprite cache when the source images have not changed
+        """
+        return sprite_cache.cached_sprites(
+            Settings.sprite_cache_folder,
+            'butterflies',
+            glob.glob(os.path.join('images', 'butterflies', '*.png')),
+            f'angle step {Settings.butterfly_angle_step}',
+            self.rotate_butterflies
+        )
+
+    def rotate_butterflies(self):
         result = {}
         for size in 'small', 'large':
             for sex in 'male', 'female':
-                source_image = pygame.image.load(
-                    os.path.join('images', 'butterflies', f'{size}_{sex}.png')
-                )
+                source_image = assets.image('images', 'butterflies', f'{size}_{sex}.png')
 
-                for angle in range(0, 360, 15):
+                for angle in range(0, 360, Settings.butterfly_angle_step):
                     result[(size, sex, angle)] = utilities.rotate_in_place(source_image, angle + 90)
 
         # for butterfly_type in os.listdir(source_folder):
@@ -139,60 +216,123 @@ class Game:
         #             )
         return result
 
-    def write_text(self, lines, location):
-        for i, line in enumerate(lines):
-            y = location.y + i * Settings.line_spacing
-            self.canvas.blit(
-                self.font.render(line, True, pygame.Color('white')),
-                (location.x, y)
-            )
-
-    def show_intro(self):
-        lines = [line.strip() for line in self.level.introduction_text.split('\n') if line.strip()]
-        self.write_text(lines, Settings.console_text_location)
-
-    def show_help(self):
-        self.canvas.blit(self.help_image, (0, 0))
-        self.write_text(self.help_lines, Settings.help_text_location)
+    def text_surface(self, lines, location):
+        """
+        The lines composed onto one surface, which is only redrawn when the text or location changes
+        """
+        key = tuple(lines), tuple(location)
+        if key != self._text_key:
+            self._text_key = key
+            self._text_surface = self.compose_text(lines)
+        return self._text_surface
 
-    def show_play_console(self):
+    def write_text(self, lines, location):
+        self.canvas.blit(self.text_surface(lines, location), location)
+
+    def compose_text(self, lines):
+        images = [self.text_cache.render(line, pygame.Color('white')) for line in lines]
+        width = max((image.get_width() for image in images), default=1)
+        height = max((i * Settings.line_spacing + image.get_height() for i, image in enumerate(images)), default=1)
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for i, image in enumerate(images):
+            # Onto transparent pixels, BLEND_RGBA_MAX keeps the anti-aliased edges as rendered
+            surface.blit(image, (0, i * Settings.line_spacing), special_flags=pygame.BLEND_RGBA_MAX)
+        return surface
+
+    def intro_lines(self):
+        return [line.strip() for line in self.level.introduction_text.split('\n') if line.strip()]
+
+    def play_console_lines(self):
         lines = [self.level.aim_text]
         boid_count = [(i, len(level.flock.boids)) for (i, level) in enumerate(self.levels, 1)]
         status = ', '.join(f'{i}: {count}' for (i, count) in boid_count)
         lines.append(f'Butterflies by level: {status}')
-        self.write_text(lines, Settings.console_text_location)
+        return lines
 
-    def show_console(self):
+    def console_text(self):
+        """
+        The lines of text to show for the current state, and where to show them
+        """
+        if self.state == enums.GameState.READ_INTRO:
+            return self.intro_lines(), Settings.console_text_location
+        elif self.state == enums.GameState.PLAY:
+            return self.play_console_lines(), Settings.console_text_location
+        elif self.state == enums.GameState.HELP:
+            return self.help_lines, Settings.help_text_location
+        return [], Settings.console_text_location
+
+    def profiler_rect(self):
+        """
+        The area covered by the profiler overlay: from its location to the right of the screen
+        """
+        x, bottom = Settings.profiler_location
+        height = len(self.profiler.averages()) * Settings.profiler_line_spacing
+        return pygame.Rect(x, bottom - height, Settings.screen_size.x - x, height)
+
+    def show_profiler(self):
+        """
+        Average milliseconds per frame for each phase, bottom right, next to the console
+        """
+        lines = [f'{name}: {milliseconds:.2f} ms' for (name, milliseconds) in self.profiler.averages()]
+        x, bottom = Settings.profiler_location
+        y = bottom - len(lines) * Settings.profiler_line_spacing
+        for i, line in enumerate(lines):
+            self.canvas.blit(
+                self.profiler_font.render(line, True, pygame.Color('white')),
+                (x, y + i * Settings.profiler_line_spacing)
+            )
+
+    def update_buttons(self):
         for button in self.buttons.values():
             button.visible = False
         if self.state == enums.GameState.READ_INTRO:
             self.buttons['ok'].visible = True
-            self.show_intro()
         elif self.state == enums.GameState.PLAY:
             self.buttons['pause'].visible = True
             self.buttons['help'].visible = True
-            self.show_play_console()
         elif self.state == enums.GameState.PAUSE:
             self.buttons['play'].visible = True
         elif self.state == enums.GameState.HELP:
             self.buttons['ok'].visible = True
-            self.show_help()
+
+    def show_console(self):
+        self.update_buttons()
+        if self.state == enums.GameState.HELP:
+            self.canvas.blit(self.help_image, (0, 0))
+        lines, location = self.console_text()
+        if lines:
+            self.write_text(lines, location)
 
         [button.draw() for button in self.buttons.values()]
 
-    def draw(self):
+    def draw_scene(self, interpolation=1):
+        """
+        Draw everything onto the canvas, without updating the display
+        """
         # self.canvas.blit(self.background, (-self.background_offset, 0))
         # [flower.draw() for flower in self.flowers]
         # [flock.draw() for flock in self.flocks]
         # [food_source.draw() for food_source in self.food_sources]
         # if self.is_mating_season:
         #     pygame.draw.rect(self.canvas, pygame.Color('orange'), (20, 20, 50, 50), 5)
-        self.level.draw()
+        with self.profiler.phase('Level.draw'):
+            self.level.draw(interpolation)
 
         if self.time_keeper:
             self.time_keeper.draw()
-        self.show_console()
-        pygame.display.flip()
+        with self.profiler.phase('Game.show_console'):
+            self.show_console()
+        if self.profiler.enabled:
+            self.show_profiler()
+
+    def draw(self, interpolation=1):
+        if self.renderer is not None:
+            self.renderer.draw(interpolation)
+        else:
+            self.draw_scene(interpolation)
+            with self.profiler.phase('pygame.display.flip'):
+                pygame.display.flip()
+        self.profiler.end_frame()
 
     def unbounce_button(self, button):
         if button in [
@@ -224,17 +364,7 @@ class Game:
         elif name == 'help':
             self.state = enums.GameState.HELP
 
-    def update(self, duration):
-        # [flower.update(duration) for flower in self.flowers]
-        # [flock.update(duration) for flock in self.flocks]
-        # [food_source.update(duration) for food_source in self.food_sources]
-
-        # leader_boids = [
-        #     boid
-        #     for flock in self.flocks
-        #     for boid in flock.boids
-        #     if boid.is_leader
-        # ]
+    def handle_input(self):
         done = False
         for event in pygame.event.get():
             if event.type == pygame.KEYDOWN:
@@ -243,20 +373,123 @@ class Game:
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_position = pygame.mouse.get_pos()
                 [button.handle_mouse_click(mouse_position) for button in self.buttons.values()]
+            elif event.type == pygame.VIDEOEXPOSE and self.renderer is not None:
+                self.renderer.invalidate()
             elif event.type == pygame.QUIT:
                 done = True
 
-        if self.state == enums.GameState.PLAY:
+        return done
+
+    def simulate(self, duration):
+        self.ticks += 1
+        with self.profiler.phase('EventHandler.advance'):
+            self.event_handler.advance(duration)
+        if self.time_keeper:
+            self.time_keeper.update(duration)
+        if self.level_workers is not None:
+            self.simulate_in_parallel(duration)
+            return
+
+        with self.profiler.phase('Game.simulate'):
             # [level.update(duration) for level in self.levels]
             self.level.update(duration)
             self.set_current_level()
+        with self.profiler.phase('Game.simulate_background'):
+            self.simulate_background(duration)
 
-        return done
+    def simulate_in_parallel(self, duration):
+        """
+        Step the other levels in the worker processes whilst stepping the current level here
+        """
+        with self.profiler.phase('Game.simulate'):
+            submitted = self.level_workers.submit([level for level in self.levels if level is not self.level], duration)
+            self.level.update(duration)
+            with self.profiler.phase('LevelWorkers.collect'):
+                self.level_workers.collect(submitted)
+            self.set_current_level()
+
+    def simulate_background(self, duration):
+        """
+        Keep the levels without the leader going, in steps of Settings.background_simulation_step
+        The levels take turns, one step at a time, until they have caught up or the time budget is used up
+        """
+        levels = [level for level in self.levels if level is not self.level]
+        self.background_lag.pop(self.level, None)
+        for level in levels:
+            lag = self.background_lag.get(level, 0) + duration
+            self.background_lag[level] = min(lag, Settings.background_maximum_lag)
+
+        step = Settings.background_simulation_step
+        deadline = time.perf_counter() + Settings.background_simulation_budget
+        # Stop once a whole round finds nothing to do
+        idle = 0
+        while idle < len(levels) and time.perf_counter() < deadline:
+            self._background_turn = (self._background_turn + 1) % len(levels)
+            level = levels[self._background_turn]
+            if self.background_lag[level] < step:
+                idle += 1
+                continue
+
+            idle = 0
+            self.background_lag[level] -= step
+            level.update_background(step)
+
+    def dump_event_trace(self, path=None):
+        path = path or Settings.event_trace_path
+        self.event_trace.dump(path)
+        logger.warning('%s events written to %s', len(self.event_trace), path)
+
+    @contextlib.contextmanager
+    def dumping_event_trace_on_crash(self):
+        try:
+            yield
+        except Exception:
+            self.dump_event_trace()
+            raise
 
     def run(self):
-        self.clock.tick(30)
+        """
+        Run the simulation in fixed steps of Settings.simulation_step, independent of the frame rate
+        Time left over after the last whole step is used to draw the boids part way to their next location
+        """
+        step = Settings.simulation_step
+        self.clock.tick(Settings.frames_per_second)
+        unsimulated_time = 0
         done = False
         while not done:
-            duration = self.clock.tick(30) / 1000
-            done = self.update(duration)
-            self.draw()
+            unsimulated_time += self.clock.tick(Settings.frames_per_second) / 1000
+            done = self.handle_input()
+
+            if self.state != enums.GameState.PLAY:
+                unsimulated_time = 0
+                self.draw()
+                continue
+
+            steps = 0
+            while unsimulated_time >= step and steps < Settings.maximum_simulation_steps_per_frame:
+                self.simulate(step)
+                unsimulated_time -= step
+                steps += 1
+
+            # Too far behind to catch up: slow down rather than take ever more steps per frame
+            if unsimulated_time >= step:
+                unsimulated_time %= step
+
+            self.draw(unsimulated_time / step)
+
+    def run_headless(self, ticks, duration):
+        """
+        Simulate ticks steps of duration seconds each, as fast as possible, and report the throughput
+        """
+        boid_updates = 0
+        start = time.perf_counter()
+        for _ in range(ticks):
+            boid_updates += len(self.level.flock.boids)
+            self.simulate(duration)
+        elapsed = time.perf_counter() - start
+
+        print(f'{ticks} ticks in {elapsed:.2f}s: '
+              f'{ticks / elapsed:.1f} ticks/s, {boid_updates / elapsed:.1f} boid updates/s')
+        print('Butterflies by level: ' + ', '.join(
+            f'{i}: {len(level.flock.boids)}' for (i, level) in enumerate(self.levels, 1)
+        ))
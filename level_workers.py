@@ -0,0 +1,231 @@
+import array
+import concurrent.futures
+import logging
+import math
+import types
+
+import pygame
+
+from boid import Boid
+from enums import BoidSex
+from event_handler import EventHandler
+from food_source import FoodSource
+from obstacle import Obstacle
+from settings import Settings
+from states import states
+
+logger = logging.getLogger(__name__)
+
+# Each boid is sent as one row of these values, all rows for a flock in one array of doubles
+COLUMNS = 'x', 'y', 'velocity_x', 'velocity_y', 'food', 'state', 'age', 'death_clock', 'in_landing_zone', 'sex'
+ROW_SIZE = len(COLUMNS)
+
+
+def pack_flock(boids):
+    rows = array.array('d')
+    for boid in boids:
+        location, velocity = boid.location, boid.velocity
+        rows.extend((
+            location.x, location.y, velocity.x, velocity.y, boid.food, boid.state.code, boid.age,
+            math.nan if boid.death_clock is None else boid.death_clock,
+            boid.in_landing_zone, boid.sex.value,
+        ))
+    return rows
+
+
+def unpack_boid(boid, rows, row):
+    x, y, velocity_x, velocity_y, food, state, age, death_clock, in_landing_zone, sex = \
+        rows[row * ROW_SIZE:(row + 1) * ROW_SIZE]
+    boid.previous_location = boid.location
+    boid.location = pygame.Vector2(x, y)
+    boid.velocity = pygame.Vector2(velocity_x, velocity_y)
+    # Setting these reschedules the boid's events, so only when they changed
+    if food != boid.food:
+        boid.food = food
+    boid.state = states.by_code[int(state)]
+    boid.age = age
+    death_clock = None if math.isnan(death_clock) else death_clock
+    if death_clock != boid.death_clock:
+        boid.death_clock = death_clock
+    boid.in_landing_zone = bool(in_landing_zone)
+    boid.sex = BoidSex(int(sex))
+
+
+class GateRecorder(EventHandler):
+    """
+    Event handler for the worker processes
+    Boids going through a gate are noted, rather than moved, so the main process can move them
+    Nothing is scheduled, as the main process sends the timed events, such as boids getting hungry
+    """
+    def __init__(self, game):
+        super().__init__(game)
+        self.transfers = []
+
+    def handle_through_exit_gate(self, boid):
+        self.transfers.append((boid.row, 'next'))
+
+    def handle_through_entrance_gate(self, boid):
+        self.transfers.append((boid.row, 'previous'))
+
+    def schedule(self, delay, action, *args):
+        # Timed events are sent by the main process
+        return None
+
+
+# The game in each worker process, holding the levels and flocks the steps are run on
+_game = None
+# Boids in each worker's flocks, by level index, kept so they can be reused from one step to the next
+_boids = {}
+
+
+# Settings which can be changed when the game starts, so are passed on to the workers
+# Workers started with spawn import settings afresh, rather than getting a copy of the main process
+WORKER_SETTINGS = 'use_flock_arrays', 'time_keeper_multiplier'
+
+
+def start_worker(settings):
+    global _game
+    import game
+
+    for name, value in settings.items():
+        setattr(Settings, name, value)
+    # The worker steps the flocks itself
+    Settings.level_workers = 0
+    _game = game.Game(None, starting_level=1)
+    _game.event_handler = GateRecorder(_game)
+
+
+def refresh(index, values, make):
+    """
+    Replace the contents of index, a CircleIndex, when values has changed
+    """
+    if [(item.location.x, item.location.y, item.radius, item.weight) for item in index] != values:
+        index.clear()
+        [index.add(make(pygame.Vector2(x, y), radius, weight)) for (x, y, radius, weight) in values]
+
+
+def step_level(level_index, duration, rows, context):
+    """
+    Run in a worker: one step of the flock on level level_index, starting from the boid states in rows
+    Returns the boid states afterwards, the rows of the boids still alive, and the gate transfers
+    """
+    game = _game
+    level = game.levels[level_index]
+    flock = level.flock
+    # Events sent to all boids go to this flock
+    game.level = level
+
+    game.active_forces = set(context['active_forces'])
+    game.event_handler.active_events = set(context['active_events'])
+    game.event_handler.transfers = []
+    game.boids_need_food = context['boids_need_food']
+    game.time_keeper = types.SimpleNamespace(is_sunset=context['is_sunset']) if context['has_time_keeper'] else None
+    refresh(level.food_sources, context['food_sources'], lambda *values: FoodSource(*values, level=0, canvas=None))
+    refresh(level.obstacles, context['obstacles'], Obstacle)
+
+    boids = _boids.setdefault(level_index, [])
+    flock.remove_all_boids()
+    for row in range(len(rows) // ROW_SIZE):
+        if row == len(boids):
+            boids.append(Boid(flock, pygame.Vector2(0, 0), pygame.Vector2(0, 0)))
+        boid = boids[row]
+        unpack_boid(boid, rows, row)
+        boid.row = row
+        boid.net_force = pygame.Vector2(0, 0)
+        # The row may belong to a different boid than last time
+        boid.food_target = None
+        flock.add_boid(boid)
+    flock.leader = None
+
+    flock.update(duration)
+    return pack_flock(flock.boids), [boid.row for boid in flock.boids], game.event_handler.transfers
+
+
+class LevelWorkers:
+    """
+    Steps the flocks of the levels without the leader in worker processes, one level per task
+
+    Each step, the state of a flock goes to a worker as one array of doubles, a row per boid, and comes
+    back the same way, along with anything else the flock depends on: food sources, obstacles, active
+    forces and events, and the time of day
+    Once all levels are back, boids which died are removed and gate transfers are applied, in level order
+    Flowers are still updated in the main process
+    """
+    def __init__(self, game, processes, mp_context=None):
+        """
+        mp_context: the multiprocessing context to start the workers with, the platform's default if None
+        """
+        self.game = game
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=mp_context,
+            initializer=start_worker,
+            initargs=({name: getattr(Settings, name) for name in WORKER_SETTINGS},)
+        )
+
+    def context(self, level):
+        game = self.game
+        return {
+            'active_forces': sorted(game.active_forces),
+            'active_events': list(game.event_handler.active_events),
+            'boids_need_food': game.boids_need_food,
+            'has_time_keeper': game.time_keeper is not None,
+            'is_sunset': game.time_keeper is not None and game.time_keeper.is_sunset,
+            'food_sources': [
+                (food_source.location.x, food_source.location.y, food_source.radius, food_source.weight)
+                for food_source in level.food_sources
+            ],
+            'obstacles': [
+                (obstacle.location.x, obstacle.location.y, obstacle.radius, obstacle.weight)
+                for obstacle in level.obstacles
+            ],
+        }
+
+    def submit(self, levels, duration):
+        """
+        Start a step of duration seconds for each level, returning what collect needs to finish it
+        """
+        pending = []
+        for level in levels:
+            boids = list(level.flock.boids)
+            if boids:
+                future = self.executor.submit(
+                    step_level, self.game.levels.index(level), duration, pack_flock(boids), self.context(level)
+                )
+                pending.append((level, boids, future))
+        return levels, duration, pending
+
+    def collect(self, submitted):
+        """
+        Wait for every level, then apply the results
+        Boids which arrived on a level whilst it was being stepped are left as they are
+        Boids which died are removed, whether in the step or, as their death clock ran out, in the main process
+        """
+        levels, duration, pending = submitted
+        transfers = []
+        for level, boids, future in pending:
+            rows, survivors, level_transfers = future.result()
+            for row, original_row in enumerate(survivors):
+                unpack_boid(boids[original_row], rows, row)
+
+            survivors = set(survivors)
+            for original_row, boid in enumerate(boids):
+                if original_row not in survivors:
+                    boid.alive = False
+                if not boid.alive:
+                    level.flock.remove_boid(boid)
+            transfers.extend((boids[original_row], direction) for (original_row, direction) in level_transfers)
+
+        for level in levels:
+            [flower.update(duration) for flower in level.flowers]
+
+        for boid, direction in transfers:
+            if boid.alive:
+                boid.check_gate(
+                    boid.flock.level.exit_gate_position if direction == 'next'
+                    else boid.flock.level.entrance_gate_position,
+                    direction
+                )
+
+    def close(self):
+        self.executor.shutdown()
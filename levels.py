@@ -13,6 +13,8 @@ from settings import Settings
 from enums import BoidSex, Events, GameState
 from time_keeper import TimeKeeper
 from flower import Flower
+from assets import assets
+from circle_index import CircleIndex
 
 logger = logging.getLogger(__name__)
 
@@ -31,17 +33,20 @@ class Level(abc.ABC):
     def __init__(self, game):
         self.game = game
         self.canvas = game.canvas
-        self.background = pygame.image.load(os.path.join('images', self.name.lower(), 'background.png'))
-
-        self.console_image = pygame.image.load(os.path.join('images', self.name.lower(), 'console.png'))
-        self.attractors = []
+        # Images are only loaded when the leader first enters, see Game.load_level_images
+        self.background_path = os.path.join('images', self.name.lower(), 'background.png')
+        self.console_image_path = os.path.join('images', self.name.lower(), 'console.png')
+        # Food sources, obstacles and attractors on this level, indexed by location
+        self.food_sources = CircleIndex(Settings.circle_index_cell_size)
+        self.obstacles = CircleIndex(Settings.circle_index_cell_size)
+        self.attractors = CircleIndex(Settings.circle_index_cell_size)
         self.flock = None
         self.flock = Flock(self)
         self.has_visited = False
         self._level_complete = False
 
         if self.exit_gate_position:
-            self.attractors.append(
+            self.attractors.add(
                 Attractor(self.exit_gate_position, 500, Settings.gate_radius * 2)
             )
         # 'Attractors': AttractorsRule(self, 1, [Attractor((300, 300), 50)]),
@@ -60,7 +65,32 @@ class Level(abc.ABC):
     def on_first_entry(self):
         pass
 
+    @property
+    def background(self):
+        return assets.image(self.background_path, opaque=True)
+
+    @property
+    def console_image(self):
+        return assets.image(self.console_image_path)
+
+    @property
+    def image_memory(self):
+        return assets.memory_used([self.background_path, self.console_image_path])
+
+    def load_images(self):
+        assets.image(self.background_path, opaque=True)
+        assets.image(self.console_image_path)
+
+    def prefetch_images(self):
+        assets.prefetch(self.background_path)
+        assets.prefetch(self.console_image_path)
+
+    def release_images(self):
+        assets.release(self.background_path)
+        assets.release(self.console_image_path)
+
     def leader_enters(self):
+        self.game.load_level_images(self)
         if not self.has_visited:
             self.game.event_handler.activate(self.new_events)
             self.game.help_lines += self.extra_help_lines
@@ -93,28 +123,39 @@ class Level(abc.ABC):
         return self.flock.leader is not None
 
     def update(self, duration):
-        self.flock.update(duration)
+        with self.game.profiler.phase('Level.update'):
+            self.flock.update(duration)
+            [flower.update(duration) for flower in self.flowers]
+
+    def update_background(self, duration):
+        """
+        Cheaper update, for when the leader is on another level
+        A flock which isn't moving skips the neighbour search and the flocking forces
+        """
+        self.flock.update(duration, flocking=not self.flock.is_resting)
         [flower.update(duration) for flower in self.flowers]
 
-    def draw(self):
+    @property
+    def exit_gate_colour(self):
+        if not self.exit_gate_open:
+            return pygame.Color('red')
+        elif not self.level_complete:
+            return pygame.Color('blue')
+        return pygame.Color('green')
+
+    def draw(self, interpolation=1):
         self.canvas.blit(self.background, (0, 0))
         # [
         #     item.draw(self.canvas)
         #     for item in self.flowers
         # ]
         [flower.draw() for flower in self.flowers]
-        self.flock.draw()
+        self.flock.draw(interpolation)
         if self.entrance_gate_position:
             pygame.draw.circle(self.canvas, pygame.Color('green'), self.entrance_gate_position, Settings.gate_radius, 2)
 
         if self.exit_gate_position:
-            if not self.exit_gate_open:
-                colour = pygame.Color('red')
-            elif not self.level_complete:
-                colour = pygame.Color('blue')
-            else:
-                colour = pygame.Color('green')
-            pygame.draw.circle(self.canvas, colour, self.exit_gate_position, Settings.gate_radius, 2)
+            pygame.draw.circle(self.canvas, self.exit_gate_colour, self.exit_gate_position, Settings.gate_radius, 2)
 
         self.canvas.blit(self.console_image, (0, 0))
 
@@ -145,7 +186,7 @@ class Level01(Level):
             velocity = pygame.Vector2(0, 0)
             velocity.from_polar((10, random.randint(220, 320)))
             sex = {0: BoidSex.FEMALE, 1: BoidSex.MALE}[i % 2]
-            self.flock.boids.append(Boid(self.flock, location, velocity, sex, Settings.boid_adult_age))
+            self.flock.add_boid(Boid(self.flock, location, velocity, sex, Settings.boid_adult_age))
             self.flock.leader = random.choice(self.flock.boids)
 
 
@@ -194,7 +235,7 @@ class Level03(Level):
 
     def on_first_entry(self):
         self.game.time_keeper = TimeKeeper(self.game)
-        self.game.time_keeper.set_time(60/Settings.time_keeper_multiplier)
+        self.game.time_keeper.set_time(60)
 
     def on_start_of_sunrise(self):
         self.exit_gate_open = True
@@ -211,7 +252,7 @@ class Level04(Level):
     def init_level(self):
         for location in [(235, 892), (570, 775), (970, 810)]:
             self.flowers.append(
-                Flower(self.game, location, age=Settings.flower_adult_age * random.randint(50, 100) / 100)
+                Flower(self.game, location, age=Settings.flower_adult_age * random.randint(50, 100) / 100, level=self)
             )
         self.game.active_forces.add('Hunger')
 
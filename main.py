@@ -7,19 +7,51 @@ import pygame
 import game
 from settings import Settings
 
-# pygame.init()
-pygame.font.init()
-pygame.display.init()
-pygame.key.set_repeat(10)
-
-canvas = pygame.display.set_mode(Settings.screen_size_as_integer)
-
-parser = argparse.ArgumentParser()
-parser.add_argument('--debug', action='store_true')
-parser.add_argument('--level', type=int, default=1)
-args = parser.parse_args()
-if args.debug:
-    logging.basicConfig(level=logging.DEBUG)
-
-game = game.Game(canvas, starting_level=args.level)
-game.run()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--debug', action='store_true')
+    parser.add_argument('--level', type=int, default=1)
+    parser.add_argument('--flock-arrays', action='store_true')
+    parser.add_argument('--dirty-rects', action='store_true', help='only redraw the parts of the screen which changed')
+    parser.add_argument('--profile-overlay', action='store_true', help='show how long each part of a frame takes (F3)')
+    parser.add_argument('--level-workers', type=int, default=0,
+                        help='number of processes simulating the levels without the leader in parallel')
+    parser.add_argument('--headless', action='store_true', help='simulate without a display and report the throughput')
+    parser.add_argument('--ticks', type=int, default=1000, help='number of steps to simulate when headless')
+    parser.add_argument('--dt', type=float, default=1/30, help='seconds per step when headless')
+    parser.add_argument('--time-speed', type=float, default=Settings.time_keeper_multiplier,
+                        help='how many times faster than normal the time of day goes')
+    args = parser.parse_args()
+    if args.time_speed < 0:
+        parser.error('--time-speed must not be negative')
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    if args.flock_arrays:
+        Settings.use_flock_arrays = True
+    if args.dirty_rects:
+        Settings.use_dirty_rects = True
+    Settings.level_workers = args.level_workers
+    Settings.time_keeper_multiplier = args.time_speed
+
+    if args.headless:
+        the_game = game.Game(None, starting_level=args.level)
+        with the_game.dumping_event_trace_on_crash():
+            the_game.run_headless(args.ticks, args.dt)
+    else:
+        # pygame.init()
+        pygame.font.init()
+        pygame.display.init()
+        pygame.key.set_repeat(10)
+
+        canvas = pygame.display.set_mode(Settings.screen_size_as_integer)
+
+        the_game = game.Game(canvas, starting_level=args.level)
+        the_game.profiler.enabled = args.profile_overlay
+        with the_game.dumping_event_trace_on_crash():
+            the_game.run()
+
+
+# Worker processes started with spawn import this module again, so only start the game when it is run
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import collections
+import contextlib
+import time
+
+
+class Profiler:
+    """
+    Rolling per-phase timings over the last few frames
+    Whilst disabled, nothing is measured, so the cost is a single check per phase
+    """
+    def __init__(self, window=30, enabled=False):
+        self.enabled = enabled
+        self.window = window
+        self._frame = collections.defaultdict(float)
+        self._history = {}
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._frame.clear()
+        self._history.clear()
+
+    def add(self, name, seconds):
+        self._frame[name] += seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        yield
+        self._frame[name] += time.perf_counter() - start
+
+    def end_frame(self):
+        """
+        Move the totals for this frame into the rolling history
+        Phases which did not run this frame count as zero
+        """
+        if not self.enabled:
+            return
+
+        for name in self._frame:
+            if name not in self._history:
+                self._history[name] = collections.deque(maxlen=self.window)
+        for name, history in self._history.items():
+            history.append(self._frame.get(name, 0))
+        self._frame.clear()
+
+    def averages(self):
+        """
+        (phase, average milliseconds per frame) for each phase, in the order they were first seen
+        """
+        return [
+            (name, sum(history) / len(history) * 1000)
+            for name, history in self._history.items()
+        ]
@@ -0,0 +1,64 @@
+import heapq
+import itertools
+
+
+class Scheduler:
+    """
+    Actions to run at a given simulation time, kept on a heap ordered by time
+
+    advance moves the time on and runs everything which is due, in time order, then in the order they were scheduled
+    Anything scheduled whilst they run, even for the current time, waits for the next advance
+    Cancelled actions stay on the heap until they come up, unless they are the majority, when the heap is rebuilt
+    """
+    def __init__(self):
+        self.time = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._queue) - self._cancelled
+
+    def schedule(self, time, action, *args):
+        """
+        Run action(*args) at time, returning the timer, which can be passed to cancel
+        """
+        timer = [time, next(self._sequence), action, args]
+        heapq.heappush(self._queue, timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer[2] is None:
+            return
+
+        timer[2] = None
+        # Off the heap already: due, and waiting to run in advance
+        if timer[1] is None:
+            return
+
+        self._cancelled += 1
+        if self._cancelled > len(self._queue) // 2:
+            self._queue = [timer for timer in self._queue if timer[2] is not None]
+            heapq.heapify(self._queue)
+            self._cancelled = 0
+
+    def advance(self, duration):
+        self.time += duration
+        queue = self._queue
+        due = []
+        while queue and queue[0][0] <= self.time:
+            timer = heapq.heappop(queue)
+            if timer[2] is None:
+                self._cancelled -= 1
+            else:
+                timer[1] = None
+                due.append(timer)
+
+        for timer in due:
+            action, args = timer[2], timer[3]
+            # Cancelled by one of the actions before it
+            if action is None:
+                continue
+
+            timer[2] = None
+            action(*args)
@@ -28,6 +28,9 @@ class Settings:
 
     boid_maximum_speed = 150
 
+    # Keep boid locations, velocities, food and states in numpy arrays owned by the flock (needs numpy)
+    use_flock_arrays = False
+
     steering_force = 4
     landing_range = 25  # Once within 5 of the ground level, stop moving
     landed_period = 3  # Once landed, wait 3 seconds before moving off again
@@ -36,6 +39,11 @@ class Settings:
 
     flower_adult_age = 10
     flower_seed_period = 5
+    # Whilst growing, flowers are drawn from flower_minimum_scale to flower_full_size_scale of their full size,
+    # in flower_growth_frames steps
+    flower_minimum_scale = 0.1
+    flower_full_size_scale = 0.97
+    flower_growth_frames = 32
     # flower_adult_age = 1
     # flower_seed_period = 0
 
@@ -62,6 +70,8 @@ class Settings:
     leader_weighing_factor = 10
 
     gate_radius = 27
+    # Cell size for the per-level indexes of food sources, obstacles and attractors
+    circle_index_cell_size = 200
 
     shouting_distance = 900
     shouting_force = 100
@@ -104,14 +114,38 @@ class Settings:
     sunrise_start_time = night_start_time + night_duration
 
     # The larger this number, the faster the game goes
-    # At 1, a day lasts time_keeper_total_duration seconds
+    # At 1, a day lasts time_keeper_one_day_duration seconds of simulation time
     time_keeper_multiplier = 1
 
+    # Level images are freed, furthest level first, when they take more than this many bytes
+    # Each level's background and console take about 15MB
+    level_image_memory_budget = 40 * 1024 * 1024
+
+    # Butterfly images are pre-rotated in steps of this many degrees, and cached in sprite_cache_folder
+    butterfly_angle_step = 15
+    sprite_cache_folder = 'cache'
+
     boid_status_icon_offset = pygame.Vector2(16, 0)
     leader_status_icon_offset = pygame.Vector2(33, -9)
 
     time_to_die = 3
 
+    # The simulation moves on in fixed steps of simulation_step seconds
+    # Frames are drawn up to frames_per_second, with boids drawn between their last two simulated locations
+    # If drawing falls behind, at most maximum_simulation_steps_per_frame steps are run before the next frame
+    simulation_step = 1 / 30
+    maximum_simulation_steps_per_frame = 5
+    frames_per_second = 60
+
+    # Levels without the leader are simulated in coarser steps, taking turns, see Game.simulate_background
+    # At most background_simulation_budget seconds are spent on them per step of the current level
+    # A level which falls more than background_maximum_lag seconds behind skips the extra time
+    background_simulation_step = 0.1
+    background_simulation_budget = 0.003
+    background_maximum_lag = 1
+    # Number of worker processes stepping the other levels in full, in parallel, instead. 0 for none
+    level_workers = 0
+
     console_location = pygame.Vector2(33, 835)
 
     help_text_location = pygame.Vector2(60, 70)
@@ -119,3 +153,22 @@ class Settings:
     font_size = 36
 
     console_text_location = console_location + pygame.Vector2(20, 5)
+    # Number of rendered lines of text to keep
+    text_cache_size = 64
+
+    # Frame profiler overlay, F3 to show/hide. Location is the bottom left of the text
+    profiler_location = pygame.Vector2(1300, 1025)
+    profiler_font_size = 18
+    profiler_line_spacing = 19
+
+    # Number of state machine events kept in the event trace, and where it is written, with F4 or on a crash
+    # See event_trace.py for reading it back
+    event_trace_size = 10000
+    event_trace_path = 'event_trace.bin'
+
+    # Only redraw and update the parts of the screen which changed, see dirty_rects.py
+    use_dirty_rects = False
+    # Pixels added around each changed rect, to cover rounding of sub-pixel locations
+    dirty_rect_margin = 2
+    # When more than this fraction of the screen changed, draw and flip the whole screen instead
+    dirty_rect_maximum_fraction = 0.4
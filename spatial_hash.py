@@ -0,0 +1,46 @@
+import collections
+
+
+class SpatialHash:
+    """
+    Uniform grid of square cells, used to find items near a location without checking every item
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = collections.defaultdict(list)
+
+    def cell(self, location):
+        return int(location[0] // self.cell_size), int(location[1] // self.cell_size)
+
+    def insert(self, item, location):
+        self._cells[self.cell(location)].append(item)
+
+    def remove(self, item, location):
+        self._cells[self.cell(location)].remove(item)
+
+    def nearby(self, location, radius):
+        """
+        All items in the cells overlapping the square around location
+        This may include items further away than radius, so callers still need to check the distance
+        """
+        min_x, min_y = self.cell((location[0] - radius, location[1] - radius))
+        max_x, max_y = self.cell((location[0] + radius, location[1] + radius))
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                items = self._cells.get((x, y))
+                if items:
+                    yield from items
+
+    def cells(self):
+        return self._cells.items()
+
+    def around(self, cell):
+        """
+        All items in cell and the eight cells around it
+        """
+        x, y = cell
+        for dx in -1, 0, 1:
+            for dy in -1, 0, 1:
+                items = self._cells.get((x + dx, y + dy))
+                if items:
+                    yield from items
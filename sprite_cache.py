@@ -0,0 +1,130 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+
+import pygame
+
+from assets import Assets
+
+logger = logging.getLogger(__name__)
+
+# Maximum width of a packed image, in pixels
+ATLAS_WIDTH = 2048
+
+
+def cache_key(source_files, parameters):
+    """
+    Hash of the names and contents of the source files plus the parameters used to build the sprites
+    """
+    digest = hashlib.sha1(str(parameters).encode())
+    for filename in sorted(source_files):
+        digest.update(os.path.basename(filename).encode())
+        with open(filename, 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()[:16]
+
+
+def pack(sprites):
+    """
+    Lay out sprites in rows, left to right
+    Returns the packed image and {key: (x, y, width, height)}
+    """
+    rects = {}
+    x = y = row_height = width = 0
+    for key in sorted(sprites):
+        sprite_width, sprite_height = sprites[key].get_size()
+        if x + sprite_width > ATLAS_WIDTH:
+            x = 0
+            y += row_height
+            row_height = 0
+        rects[key] = (x, y, sprite_width, sprite_height)
+        x += sprite_width
+        row_height = max(row_height, sprite_height)
+        width = max(width, x)
+
+    atlas = pygame.Surface((max(width, 1), max(y + row_height, 1)), pygame.SRCALPHA)
+    for key, rect in rects.items():
+        # Onto fully transparent pixels, BLEND_RGBA_MAX copies the sprite exactly, instead of alpha blending it
+        atlas.blit(sprites[key], rect[:2], special_flags=pygame.BLEND_RGBA_MAX)
+    return atlas, rects
+
+
+def unpack(atlas, rects):
+    return {key: atlas.subsurface(rect) for key, rect in rects.items()}
+
+
+def display_format(atlas):
+    """
+    atlas in the display's pixel format, only converting it when it isn't already
+    """
+    if pygame.display.get_surface() is None:
+        return atlas
+    if atlas.get_masks() == pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha().get_masks():
+        return atlas
+    return Assets.convert(atlas)
+
+
+def save(atlas, rects, image_path, index_path):
+    """
+    The packed image is saved as its raw pixels, in its own pixel format, which is kept in the index
+    Loading it again is then a single copy, with nothing to decode, and nothing to convert for the same display
+    """
+    with open(image_path, 'wb') as image_file:
+        image_file.write(atlas.get_buffer().raw)
+    # Written last, so a complete index means a complete cache entry
+    with open(index_path, 'w') as index_file:
+        json.dump({
+            'size': atlas.get_size(),
+            'masks': atlas.get_masks(),
+            'pitch': atlas.get_pitch(),
+            'sprites': [[list(key), list(rect)] for key, rect in rects.items()],
+        }, index_file)
+
+
+def load(image_path, index_path):
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+    rects = {tuple(key): tuple(rect) for key, rect in index['sprites']}
+    atlas = pygame.Surface(tuple(index['size']), pygame.SRCALPHA, 32, tuple(index['masks']))
+    if atlas.get_pitch() != index['pitch']:
+        raise ValueError(f"pitch {index['pitch']} does not match {atlas.get_pitch()}")
+    # Read straight into the surface's pixels
+    pixels = atlas.get_view('0')
+    with open(image_path, 'rb') as image_file:
+        if image_file.readinto(pixels) != pixels.length or image_file.read(1):
+            raise ValueError(f'{image_path} is not {pixels.length} bytes')
+    return unpack(display_format(atlas), rects)
+
+
+def cached_sprites(cache_folder, name, source_files, parameters, build):
+    """
+    Sprites made by build(), a function returning {key: surface} with tuple keys of strings and numbers
+
+    The first time, build() is called and its result is saved in cache_folder as one packed image plus an index
+    After that, the sprites are loaded from the packed image with a single copy
+    The cache is rebuilt whenever source_files or parameters change
+    """
+    key = cache_key(source_files, parameters)
+    image_path = os.path.join(cache_folder, f'{name}_{key}.rgba')
+    index_path = os.path.join(cache_folder, f'{name}_{key}.json')
+
+    if os.path.exists(index_path) and os.path.exists(image_path):
+        try:
+            return load(image_path, index_path)
+        except (OSError, ValueError, KeyError, pygame.error) as error:
+            logger.warning(f'Sprite cache {index_path} could not be read, rebuilding: {error}')
+
+    sprites = build()
+    atlas, rects = pack(sprites)
+    atlas = display_format(atlas)
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        for old_file in glob.glob(os.path.join(cache_folder, f'{name}_*')):
+            os.remove(old_file)
+        save(atlas, rects, image_path, index_path)
+    except OSError as error:
+        logger.warning(f'Sprite cache could not be written to {cache_folder}: {error}')
+
+    return unpack(atlas, rects)
@@ -1,14 +1,10 @@
 import collections
-import logging
-logger = logging.getLogger(__name__)
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-
-class NoSuitableTransition(Exception):
-    pass
-
-
-class FailedGuard(Exception):
-    pass
+from event_trace import ALL_BOIDS, NO_TRANSITION
 
 
 class StateMachine:
@@ -19,33 +15,121 @@ class StateMachine:
         self.states = []
         self.game = game
 
-    def handle_event(self, event, boid=None):
-        boids = [boid] if boid is not None else self.game.level.flock.boids
+    def handle_event(self, event, boid=None, flock=None):
+        """
+        The event goes to boid or, without a boid, to all boids in flock - by default the leader's flock
+        Only boids in a state with transitions for the event are visited
+        """
+        if boid is not None:
+            self.transition(boid, event)
+            return
+
+        flock = flock or self.game.level.flock
+        if flock.store is not None:
+            self.broadcast_to_store(event, flock)
+            return
+
+        boids = [
+            boid
+            for state, boids_in_state in flock.members.items() if event in state.transitions
+            for boid in boids_in_state
+        ]
         for boid in boids:
-            try:
-                old_state = boid.state
-                boid.state = boid.state.handle_event(event, boid)
-                logger.debug(f'{boid} transitioned from {old_state} to {boid.state}')
-            except NoSuitableTransition:
-                logger.debug(f'{boid} no transition found for {event} - ignored')
+            self.transition(boid, event)
+
+    def broadcast_to_store(self, event, flock):
+        """
+        Send event to all boids in flock, whose states are in its FlockStore
+        Where the transition for a state is certain - its first transition has no guards - and all its actions
+        have batch versions, all boids in the state are moved at once, as array updates
+        Otherwise each boid in the state goes through transition
+        """
+        store = flock.store
+        # Which boids are in which state is decided before any of them move, as it is one boid at a time
+        rows_by_state = [
+            (state, numpy.flatnonzero(store.states == state.code), list(flock.members[state]))
+            for state in list(flock.members) if event in state.transitions and flock.members[state]
+        ]
+        for state, rows, boids in rows_by_state:
+            transition = state.batch_transition(event)
+            if transition is None:
+                for boid in boids:
+                    self.transition(boid, event)
+                continue
+
+            target_state = transition.target_state
+            [exit_action.batch(flock, rows) for exit_action in state.exit_actions]
+            if transition.action:
+                transition.action.batch(flock, rows)
+            store.states[rows] = target_state.code
+            [enter_action.batch(flock, rows) for enter_action in target_state.enter_actions]
+            flock.states_changed(rows, state, target_state)
+            self.game.event_trace.record(self.game.ticks, ALL_BOIDS, event.value, state.code, target_state.code)
+
+    def transition(self, boid, event):
+        old_state = boid.state
+        transition = old_state.find_transition(event, boid)
+        if transition is None:
+            self.game.event_trace.record(self.game.ticks, boid.id, event.value, old_state.code, NO_TRANSITION)
+            return
+
+        new_state = old_state.take(transition, boid)
+        boid.state = new_state
+        self.game.event_trace.record(self.game.ticks, boid.id, event.value, old_state.code, new_state.code)
 
 
 class State:
     def __init__(self, name):
         self.name = name
+        # Small integer, set by States, used when boid states are stored in an array
+        self.code = None
         self.transitions = collections.defaultdict(list)
         self.game = None
         self.exit_actions = []
         self.enter_actions = []
+        # Food added per second whilst in this state, on top of what is used up
+        self.food_rate = 0
 
     def add_transition(self, event, transition):
         self.transitions[event].append(transition)
 
-    def try_transition(self, transition, boid):
-        for guard in transition.guards:
-            if not guard(boid):
-                raise FailedGuard
-
+    def compile(self):
+        """
+        Freeze the transitions once they have all been added: a plain lookup from event to its transitions
+        """
+        self.transitions = {event: tuple(transitions) for event, transitions in self.transitions.items()}
+
+    def find_transition(self, event, boid):
+        """
+        The first transition for event with all its guards passing for boid, or None
+        """
+        for transition in self.transitions.get(event, ()):
+            if transition.allowed(boid):
+                return transition
+        return None
+
+    def batch_transition(self, event):
+        """
+        The transition for event when it can be applied to all boids in this state at once, or None
+        """
+        transitions = self.transitions.get(event)
+        if not transitions or transitions[0].guards:
+            return None
+        transition = transitions[0]
+        # Each boid's food would need to be brought up to date before the rate changes
+        if transition.target_state.food_rate != self.food_rate:
+            return None
+        actions = self.exit_actions + transition.target_state.enter_actions
+        if transition.action:
+            actions.append(transition.action)
+        if not all(hasattr(action, 'batch') for action in actions):
+            return None
+        return transition
+
+    def take(self, transition, boid):
+        """
+        Run the exit, transition and enter actions, and return the new state
+        """
         [exit_action(boid) for exit_action in self.exit_actions]
         if transition.action:
             transition.action(boid)
@@ -53,17 +137,6 @@ class State:
         [enter_action(boid) for enter_action in target_state.enter_actions]
         return target_state
 
-    def handle_event(self, event, boid):
-        transitions_for_event = self.transitions.get(event, [])
-
-        for transition in transitions_for_event:
-            try:
-                return self.try_transition(transition, boid)
-            except FailedGuard:
-                logger.debug(f'{boid} failed guard for {event} - ignored')
-
-        raise NoSuitableTransition
-
     def __str__(self):
         return self.name
 
@@ -73,3 +146,6 @@ class Transition:
         self.guards = guards if guards is not None else []
         self.target_state = target_state
         self.action = action
+
+    def allowed(self, boid):
+        return all(guard(boid) for guard in self.guards)
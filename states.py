@@ -1,22 +1,66 @@
 import random
 
+import pygame
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from settings import Settings
 import enums
 from state_machine import State, Transition
 
 
+# Each action takes a boid
+# An action's batch version, if it has one, does the same for the boids in rows of a flock's FlockStore
+
+
 def to_top_of_landing_zone(boid):
-    boid.location.y = boid.game.level.landing_zone_top
+    boid.location = pygame.Vector2(boid.location.x, boid.flock.level.landing_zone_top)
+
+
+def to_top_of_landing_zone_batch(flock, rows):
+    flock.store.positions[rows, 1] = flock.level.landing_zone_top
+
+
+to_top_of_landing_zone.batch = to_top_of_landing_zone_batch
 
 
 def not_below_landing_zone(boid):
-    boid.location.y = min(boid.game.level.landing_zone_top, boid.location.y)
+    boid.location = pygame.Vector2(boid.location.x, min(boid.flock.level.landing_zone_top, boid.location.y))
+
+
+def not_below_landing_zone_batch(flock, rows):
+    positions = flock.store.positions
+    positions[rows, 1] = numpy.minimum(positions[rows, 1], flock.level.landing_zone_top)
+
+
+not_below_landing_zone.batch = not_below_landing_zone_batch
 
 
 def start_death_clock(boid):
     boid.death_clock = Settings.time_to_die
 
 
+def start_death_clock_batch(flock, rows):
+    event_handler = flock.game.event_handler
+    death_time = event_handler.time + Settings.time_to_die
+    flock.store.death_times[rows] = death_time
+    event_handler.schedule(Settings.time_to_die, end_death_clocks, [flock.store.boids[row] for row in rows], death_time)
+
+
+start_death_clock.batch = start_death_clock_batch
+
+
+def end_death_clocks(boids, death_time):
+    """
+    Scheduled for when the death clocks started at the same time run out
+    """
+    for boid in boids:
+        if boid.alive and boid.death_time == death_time:
+            boid.die()
+
+
 def on_start_of_sunrise(boid):
     try:
         boid.flock.level.on_start_of_sunrise()
@@ -24,6 +68,14 @@ def on_start_of_sunrise(boid):
         pass
 
 
+def on_start_of_sunrise_batch(flock, rows):
+    # A change to the level, so once is enough
+    on_start_of_sunrise(flock.store.boids[rows[0]])
+
+
+on_start_of_sunrise.batch = on_start_of_sunrise_batch
+
+
 class States:
     def __init__(self):
         self.FLYING = State('FLYING')
@@ -34,7 +86,14 @@ class States:
         self.HUNGRY = State('HUNGRY')
         self.FEEDING = State('FEEDING')
 
+        self.by_code = [
+            self.FLYING, self.LANDING, self.LANDED, self.SLEEPING, self.DYING, self.HUNGRY, self.FEEDING,
+        ]
+        for code, state in enumerate(self.by_code):
+            state.code = code
+
         self.init_states()
+        [state.compile() for state in self.by_code]
 
     def init_states(self):
         # TOGGLE_LANDING and Flying and not in landing zone: -> Landing
@@ -138,6 +197,9 @@ class States:
         )
         self.DYING.enter_actions.append(start_death_clock)
 
+        # Whilst feeding, food goes up rather than down
+        self.FEEDING.food_rate = Settings.feeding_speed
+
         transition = Transition(target_state=self.HUNGRY)
         for state in [
             self.FLYING, self.LANDED, self.LANDING
@@ -0,0 +1,47 @@
+import random
+
+import pygame
+
+from circle_index import CircleIndex
+from obstacle import Obstacle
+
+
+def make_index(number_of_items):
+    random.seed(5)
+    index = CircleIndex(50)
+    for _ in range(number_of_items):
+        index.add(Obstacle(pygame.Vector2(random.uniform(0, 1000), random.uniform(0, 1000)), random.uniform(5, 80)))
+    return index
+
+
+def test_queries_match_brute_force():
+    index = make_index(200)
+    for _ in range(100):
+        location = pygame.Vector2(random.uniform(-100, 1100), random.uniform(-100, 1100))
+
+        assert sorted(map(id, index.within(location, 120))) == sorted(
+            id(item) for item in index if item.location.distance_to(location) <= 120
+        )
+        assert sorted(map(id, index.containing(location))) == sorted(
+            id(item) for item in index if item.location.distance_to(location) < item.radius
+        )
+
+        accept = lambda item: item.radius > 60
+        expected = min((item for item in index if accept(item)), key=lambda item: item.location.distance_to(location))
+        assert index.nearest(location, accept) is expected
+
+
+def test_nearest_far_away_and_none():
+    index = make_index(3)
+    location = pygame.Vector2(10000, -10000)
+    assert index.nearest(location) is min(index, key=lambda item: item.location.distance_to(location))
+    assert index.nearest(location, lambda item: False) is None
+    assert CircleIndex(50).nearest(location) is None
+
+
+def test_remove():
+    index = make_index(10)
+    item = next(iter(index))
+    index.remove(item)
+    assert len(index) == 9
+    assert item not in index.within(item.location, 1)
@@ -0,0 +1,65 @@
+import types
+
+import pygame
+
+from dirty_rects import DirtyRectRenderer, merge_rects, changed_rects
+
+
+def test_merge_rects():
+    rects = [pygame.Rect(0, 0, 10, 10), pygame.Rect(100, 100, 10, 10), pygame.Rect(5, 5, 10, 10)]
+    merged = merge_rects(rects)
+    assert sorted(merged) == [pygame.Rect(0, 0, 15, 15), pygame.Rect(100, 100, 10, 10)]
+
+
+def test_merge_rects_with_margin():
+    # 4 pixels apart, so they only overlap once grown by the margin
+    rects = [pygame.Rect(0, 0, 10, 10), pygame.Rect(14, 0, 10, 10)]
+    assert len(merge_rects(rects)) == 2
+    assert merge_rects(rects, margin=3) == [pygame.Rect(-3, -3, 30, 16)]
+
+
+def test_changed_rects():
+    image, other_image = object(), object()
+    previous = {
+        'still': (pygame.Rect(0, 0, 5, 5), image),
+        'moved': (pygame.Rect(10, 0, 5, 5), image),
+        'turned': (pygame.Rect(20, 0, 5, 5), image),
+        'gone': (pygame.Rect(30, 0, 5, 5), image),
+    }
+    current = {
+        'still': (pygame.Rect(0, 0, 5, 5), image),
+        'moved': (pygame.Rect(11, 0, 5, 5), image),
+        'turned': (pygame.Rect(20, 0, 5, 5), other_image),
+        'new': (pygame.Rect(40, 0, 5, 5), image),
+    }
+    assert sorted(changed_rects(previous, current)) == [
+        pygame.Rect(10, 0, 5, 5),
+        pygame.Rect(11, 0, 5, 5),
+        pygame.Rect(20, 0, 5, 5),
+        pygame.Rect(20, 0, 5, 5),
+        pygame.Rect(30, 0, 5, 5),
+        pygame.Rect(40, 0, 5, 5),
+    ]
+
+
+def test_redraw_only_draws_layers_overlapping_the_rect():
+    canvas = pygame.Surface((100, 100))
+    renderer = DirtyRectRenderer(types.SimpleNamespace(canvas=canvas))
+    background, square = pygame.Surface((100, 100)), pygame.Surface((10, 10))
+    background.fill(pygame.Color('red'))
+    square.fill(pygame.Color('blue'))
+    drawn = []
+    layers = [
+        ('screen', canvas.get_rect(), None, background),
+        ('square', pygame.Rect(10, 10, 10, 10), None, square),
+        ('far away', pygame.Rect(80, 80, 10, 10), None, lambda: drawn.append('far away')),
+    ]
+
+    renderer.redraw([pygame.Rect(0, 0, 15, 15)], layers)
+
+    assert drawn == []
+    assert canvas.get_at((5, 5)) == pygame.Color('red')
+    assert canvas.get_at((12, 12)) == pygame.Color('blue')
+    # Outside the rect, so clipped
+    assert canvas.get_at((17, 17)) == pygame.Color('black')
+    assert canvas.get_clip() == canvas.get_rect()
@@ -0,0 +1,42 @@
+from enums import Events
+from event_trace import EventTrace, ALL_BOIDS, NO_TRANSITION, read, describe
+from game import Game
+from settings import Settings
+from states import states
+
+
+def test_ring_buffer_keeps_the_most_recent_records():
+    trace = EventTrace(3)
+    for tick in range(5):
+        trace.record(tick, 1, 2, 3, 4)
+    assert len(trace) == 3
+    assert [record[0] for record in trace.records()] == [2, 3, 4]
+
+
+def test_transitions_are_traced(tmp_path):
+    game = Game(None, starting_level=1)
+    game.ticks = 7
+    boid = game.level.flock.boids[0]
+    game.event_handler.state_machine.handle_event(Events.START_OF_SUNSET, boid)
+    game.event_handler.state_machine.handle_event(Events.START_OF_NIGHTTIME, boid)
+
+    path = tmp_path / 'trace.bin'
+    game.dump_event_trace(path)
+    assert read(path) == [
+        (7, boid.id, Events.START_OF_SUNSET.value, states.FLYING.code, NO_TRANSITION),
+        (7, boid.id, Events.START_OF_NIGHTTIME.value, states.FLYING.code, states.DYING.code),
+    ]
+    assert describe(read(path)[1]) == f'7 boid {boid.id} START_OF_NIGHTTIME: FLYING -> DYING'
+
+
+def test_batch_transitions_are_traced_once():
+    Settings.use_flock_arrays = True
+    try:
+        game = Game(None, starting_level=1)
+    finally:
+        Settings.use_flock_arrays = False
+
+    game.event_handler.state_machine.handle_event(Events.START_OF_NIGHTTIME)
+    assert game.event_trace.records() == [
+        (0, ALL_BOIDS, Events.START_OF_NIGHTTIME.value, states.FLYING.code, states.DYING.code)
+    ]
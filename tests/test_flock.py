@@ -0,0 +1,255 @@
+import collections
+import random
+import types
+
+import numpy
+import pygame
+
+import utilities
+from attractor import Attractor
+from boid import Boid
+from circle_index import CircleIndex
+from event_handler import EventHandler
+from flock import Flock
+from food_source import FoodSource
+from forces import Force
+from obstacle import Obstacle
+from profiler import Profiler
+from settings import Settings
+from states import states
+
+
+def make_flock(number_of_boids, flock_arrays=False):
+    random.seed(3)
+    game = types.SimpleNamespace(
+        canvas=None,
+        active_forces={'Separation', 'Alignment', 'Cohesion', 'Boundaries'},
+        boids_need_food=False,
+    )
+    game.event_handler = EventHandler(game)
+    level = types.SimpleNamespace(
+        game=game,
+        food_sources=CircleIndex(200),
+        obstacles=CircleIndex(200),
+        attractors=CircleIndex(200),
+    )
+    Settings.use_flock_arrays = flock_arrays
+    try:
+        flock = Flock(level)
+    finally:
+        Settings.use_flock_arrays = False
+    for _ in range(number_of_boids):
+        location = pygame.Vector2(random.uniform(0, 600), random.uniform(0, 600))
+        velocity = pygame.Vector2(random.uniform(-10, 10), random.uniform(-10, 10))
+        flock.add_boid(Boid(flock, location, velocity))
+    flock.leader = flock.boids[0]
+    flock.calculate_distances()
+    flock.calculate_neighbours()
+    return flock
+
+
+def test_neighbours_match_brute_force():
+    flock = make_flock(150)
+
+    for boid in flock.boids:
+        expected = [
+            other for other in flock.boids
+            if other is not boid and boid.location.distance_to(other.location) <= 50
+        ]
+        assert flock.neighbours(boid, 50) == expected
+
+
+def test_neighbourhood_matches_separate_forces():
+    flock = make_flock(150)
+
+    for boid in flock.boids:
+        neighbourhood = flock.neighbourhood(boid)
+
+        close = flock.neighbours(boid, 50)
+        assert neighbourhood.separation_count == len(close)
+        if close:
+            assert neighbourhood.separation_total / len(close) == \
+                utilities.point_centre(neighbour.location for neighbour in close)
+
+        near = flock.neighbours(boid, 200)
+        weight = sum(Settings.leader_weighing_factor if neighbour is flock.leader else 1 for neighbour in near)
+        assert neighbourhood.cohesion_weight == neighbourhood.alignment_weight == weight
+
+
+def test_leader_counts_more_for_alignment_and_cohesion():
+    flock = make_flock(3)
+    flock.game.active_forces = {'Alignment', 'Cohesion'}
+    leader, boid, other = flock.boids
+    boid.location, boid.velocity = pygame.Vector2(100, 100), pygame.Vector2(0, 0)
+    leader.location, leader.velocity = pygame.Vector2(150, 100), pygame.Vector2(10, 0)
+    other.location, other.velocity = pygame.Vector2(100, 150), pygame.Vector2(0, 10)
+    flock.calculate_distances()
+    flock.calculate_neighbours()
+    factor = Settings.leader_weighing_factor
+
+    flock.forces['Cohesion'].apply(boid, 1)
+    centre = (leader.location * factor + other.location) / (factor + 1)
+    assert boid.net_force == (centre - boid.location) * flock.forces['Cohesion'].weight
+
+    boid.net_force = pygame.Vector2(0, 0)
+    flock.forces['Alignment'].apply(boid, 1)
+    average_velocity = (leader.velocity * factor + other.velocity) / (factor + 1)
+    assert boid.net_force == average_velocity * flock.forces['Alignment'].weight
+
+
+def test_forces_on_store_match_per_boid_forces():
+    flocks = make_flock(150), make_flock(150, flock_arrays=True)
+    for flock in flocks:
+        flock.game.active_forces = set(flock.forces)
+        flock.level.obstacles.add(Obstacle(pygame.Vector2(300, 300), 40))
+        flock.level.attractors.add(Attractor(pygame.Vector2(200, 400), 5, 80))
+        flock.level.food_sources.add(FoodSource(pygame.Vector2(500, 100), 10, 1, level=1, canvas=None))
+        for boid in flock.boids[::10]:
+            boid.state = states.LANDING
+        for boid in flock.boids[5::20]:
+            boid.food = 0
+        flock.calculate_distances()
+        flock.calculate_neighbours()
+
+    by_boid, by_store = flocks
+    net_forces = numpy.zeros((len(by_store.boids), 2))
+    for force in by_store.forces.values():
+        force.apply_all(0.1, net_forces)
+
+    for boid, net_force in zip(by_boid.boids, net_forces):
+        for force in by_boid.forces.values():
+            force.apply(boid, 0.1)
+        assert numpy.allclose(boid.net_force, net_force)
+
+
+class GivenForces(Force):
+    def __init__(self, flock, forces):
+        super().__init__(flock)
+        self.forces = forces
+
+    def apply(self, boid, duration):
+        boid.add_force(self.forces[self.flock.boids.index(boid)])
+
+    def apply_all(self, duration, net_forces):
+        net_forces += numpy.array(self.forces)
+
+
+def test_net_forces_on_store_match_apply_force():
+    flocks = make_flock(50), make_flock(50, flock_arrays=True)
+    random.seed(4)
+    forces = [pygame.Vector2(random.uniform(-30, 30), random.uniform(-30, 30)) for _ in range(50)]
+    forces[1] = pygame.Vector2(0, 0)
+    for flock in flocks:
+        flock.leader.leader_speed_multiplier = 1.5
+        for boid in flock.boids[::3]:
+            boid.state = states.LANDING
+
+    by_boid, by_store = flocks
+    given = GivenForces(by_boid, forces)
+    for boid in by_boid.boids:
+        given.apply(boid, 1)
+        boid.apply_net_force()
+    by_store.forces['Given'] = GivenForces(by_store, forces)
+    by_store.apply_forces_to_store(1, Profiler(), ['Given'])
+
+    assert numpy.allclose(by_store.store.velocities, [list(boid.velocity) for boid in by_boid.boids])
+
+
+def test_update_store_matches_boid_update():
+    flocks = make_flock(100), make_flock(100, flock_arrays=True)
+    events = [], []
+    for flock, handled in zip(flocks, events):
+        flock.level.landing_zone_top = 300
+        flock.level.exit_gate_position = pygame.Vector2(400, 200)
+        flock.level.entrance_gate_position = None
+        flock.level.level_complete = False
+        flock.game.handle_event = lambda event, boid, handled=handled: handled.append((boid.flock.boids.index(boid), event.value))
+        for boid in flock.boids[::7]:
+            boid.state = states.LANDED
+        for boid in flock.boids[::5]:
+            boid.in_landing_zone = boid.location.y > 300
+
+    by_boid, by_store = flocks
+    for boid in by_boid.boids:
+        boid.update(0.5)
+    by_store.update_store(0.5)
+
+    assert len(events[0]) > 1 and sorted(events[0]) == sorted(events[1])
+    for boid, stored in zip(by_boid.boids, by_store.boids):
+        assert boid.location == stored.location
+        assert boid.previous_location == stored.previous_location
+        assert boid.age == stored.age
+        assert boid.in_landing_zone == stored.in_landing_zone
+
+
+def test_apply_force_clamps_speed():
+    flock = make_flock(2)
+    boid = flock.boids[1]
+    boid.velocity = pygame.Vector2(100, 0)
+
+    boid.apply_force(pygame.Vector2(0, 1000))
+
+    assert abs(boid.velocity.length() - Settings.boid_maximum_speed) < 1e-9
+    assert boid.velocity.y > boid.velocity.x > 0
+
+
+def test_landing_ignores_upward_net_force():
+    flock = make_flock(2)
+    boid = flock.boids[1]
+    boid.state = states.LANDING
+    boid.velocity = pygame.Vector2(10, 1)
+
+    boid.add_force(pygame.Vector2(0, -5))
+    boid.add_force(pygame.Vector2(0, 2))
+    boid.apply_net_force()
+    assert boid.velocity == pygame.Vector2(10, 1)
+
+    boid.add_force(pygame.Vector2(3, 2))
+    boid.apply_net_force()
+    assert boid.velocity == pygame.Vector2(13, 3)
+
+
+def test_draw_blits_icons_after_butterflies():
+    flock = make_flock(6)
+    butterfly = pygame.Surface((10, 10))
+    flock.game.images = collections.defaultdict(lambda: butterfly)
+    blitted = []
+    flock.canvas = types.SimpleNamespace(blits=lambda sequence, doreturn: blitted.extend(sequence))
+    flock.boids[1].state = states.HUNGRY
+    flock.boids[2].state = states.LANDED
+    flock.boids[3].state = states.HUNGRY
+
+    flock.draw()
+
+    images = [image for image, position in blitted]
+    assert images[:6] == [butterfly] * 6
+    assert images[6:] == [
+        flock.boids[1].status_icons[states.HUNGRY],
+        flock.boids[3].status_icons[states.HUNGRY],
+        flock.boids[2].status_icons[states.LANDED],
+    ]
+
+
+def test_hungry_boid_heads_for_nearest_food_source():
+    flock = make_flock(1)
+    boid = flock.boids[0]
+    boid.location = pygame.Vector2(100, 100)
+    boid.food = 0
+    food_sources = flock.level.food_sources
+    near = FoodSource(pygame.Vector2(150, 100), 10, 1, level=1, canvas=None)
+    far = FoodSource(pygame.Vector2(400, 100), 10, 1, level=1, canvas=None)
+    food_sources.add(far)
+    food_sources.add(near)
+    hunger = flock.forces['Hunger']
+
+    assert hunger.target(boid) is near
+    boid.location = pygame.Vector2(390, 100)
+    # Still heading for the same one, as nothing changed
+    assert hunger.target(boid) is near
+
+    nearer = FoodSource(pygame.Vector2(380, 100), 10, 1, level=1, canvas=None)
+    food_sources.add(nearer)
+    assert hunger.target(boid) is nearer
+
+    boid.exhausted_food_sources.append(nearer)
+    assert hunger.target(boid) is far
@@ -0,0 +1,45 @@
+import random
+
+import pygame
+
+from flock_store import FlockStore
+from spatial_hash import SpatialHash
+
+
+class Row:
+    slot = None
+
+
+def test_add_and_remove_keep_order():
+    store = FlockStore(capacity=2)
+    rows = [Row() for _ in range(5)]
+    for i, row in enumerate(rows):
+        store.add(row)
+        store.positions[row.slot] = (i, i)
+
+    store.remove([rows[1], rows[3]])
+
+    assert store.boids == [rows[0], rows[2], rows[4]]
+    assert [row.slot for row in store.boids] == [0, 1, 2]
+    assert store.positions.tolist() == [[0, 0], [2, 2], [4, 4]]
+
+
+def test_neighbours_match_brute_force():
+    random.seed(2)
+    store = FlockStore()
+    rows = [Row() for _ in range(200)]
+    index = SpatialHash(100)
+    for row in rows:
+        store.add(row)
+        store.positions[row.slot] = (random.uniform(0, 800), random.uniform(0, 800))
+        index.insert(row.slot, store.positions[row.slot])
+
+    neighbours = store.neighbours(store.neighbour_pairs(index, 100))
+
+    for a in rows:
+        location = pygame.Vector2(*store.positions[a.slot])
+        expected = [
+            b for b in rows
+            if b is not a and location.distance_to(pygame.Vector2(*store.positions[b.slot])) < 100
+        ]
+        assert [b for b, _ in neighbours[a]] == expected
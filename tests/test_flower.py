@@ -0,0 +1,33 @@
+import types
+
+from flower import Flower
+from game import Game
+from settings import Settings
+
+
+def test_growth_frames_are_shared_and_bounded():
+    game = types.SimpleNamespace(canvas=None)
+    flowers = [Flower(game, (100, 100)), Flower(game, (200, 100))]
+
+    frames = set()
+    for i in range(1000):
+        scaling_factor = Settings.flower_minimum_scale + \
+            i / 1000 * (Settings.flower_full_size_scale - Settings.flower_minimum_scale)
+        frame = flowers[i % 2].growth_frame(scaling_factor)
+        assert frame.get_width() <= flowers[0]._flower_rect.width * scaling_factor
+        frames.add(id(frame))
+
+    assert len(frames) <= Settings.flower_growth_frames
+    assert flowers[0].growth_frame(0.5) is flowers[1].growth_frame(0.5)
+
+
+def test_mature_flower_feeds_its_own_level_only():
+    game = Game(None, starting_level=1)
+    level = game.levels[4]
+    flower = Flower(game, (300, 700), age=Settings.flower_adult_age - 0.1, level=level)
+
+    flower.update(0.2)
+    flower.update(0.2)
+
+    assert len(level.food_sources) == len(level.obstacles) == 1
+    assert all(len(other.obstacles) == 0 for other in game.levels if other is not level)
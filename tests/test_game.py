@@ -0,0 +1,88 @@
+import pygame
+
+from enums import Events
+from game import Game
+from settings import Settings
+from states import states
+
+
+def leave_behind(game, number_of_boids):
+    """
+    Move some of the followers back to the first level, whilst the leader stays on the current level
+    """
+    here, there = game.level.flock, game.levels[0].flock
+    for boid in [boid for boid in here.boids if not boid.is_leader][:number_of_boids]:
+        here.remove_boid(boid)
+        there.add_boid(boid)
+    return there
+
+
+def test_background_levels_keep_moving():
+    game = Game(None, starting_level=2)
+    flock = leave_behind(game, 3)
+    before = [pygame.Vector2(boid.location) for boid in flock.boids]
+
+    for _ in range(10):
+        game.simulate(Settings.background_simulation_step)
+
+    assert all(boid.location != location for boid, location in zip(flock.boids, before))
+    assert game.level not in game.background_lag
+
+
+def test_background_lag_is_limited():
+    game = Game(None, starting_level=2)
+    game.simulate(Settings.background_maximum_lag * 10)
+    assert all(lag <= Settings.background_maximum_lag for lag in game.background_lag.values())
+
+
+def test_resting_flock_skips_the_neighbour_search():
+    game = Game(None, starting_level=2)
+    flock = leave_behind(game, 3)
+    for boid in flock.boids:
+        boid.state = states.SLEEPING
+    assert flock.is_resting
+
+    flock._neighbours = None
+    game.levels[0].update_background(Settings.background_simulation_step)
+    assert flock._neighbours is None
+
+
+def test_nightfall_reaches_every_level():
+    game = Game(None, starting_level=2)
+    flock = leave_behind(game, 3)
+
+    game.handle_event(Events.START_OF_NIGHTTIME)
+    assert [boid.state for boid in flock.boids] == [states.DYING] * 3
+    assert all(boid.state is states.DYING for boid in game.level.flock.boids)
+
+
+def test_hunger_events_are_scheduled():
+    game = Game(None, starting_level=1)
+    game.boids_need_food = True
+    boid = [boid for boid in game.level.flock.boids if not boid.is_leader][0]
+    boid.food = Settings.boid_hungry_level + 1
+
+    game.event_handler.advance(0.9)
+    assert boid.state is states.FLYING
+    game.event_handler.advance(0.2)
+    assert boid.state is states.HUNGRY
+    assert abs(boid.food - (Settings.boid_hungry_level - 0.1)) < 1e-9
+
+    game.event_handler.advance(Settings.boid_hungry_level)
+    assert boid.state is states.DYING
+    game.event_handler.advance(Settings.time_to_die)
+    assert not boid.alive
+
+
+def test_feeding_reschedules_the_food_events():
+    game = Game(None, starting_level=1)
+    game.boids_need_food = True
+    boid = [boid for boid in game.level.flock.boids if not boid.is_leader][0]
+    boid.state = states.HUNGRY
+    boid.food = 1
+    boid.state = states.FEEDING
+
+    rate = Settings.feeding_speed - 1
+    game.event_handler.advance((Settings.boid_maximum_food_level - 1) / rate + 0.01)
+    assert boid.state is states.FLYING
+    assert boid.food > Settings.boid_hungry_level
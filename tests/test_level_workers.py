@@ -0,0 +1,86 @@
+import multiprocessing
+
+import pygame
+
+import level_workers
+from game import Game
+from settings import Settings
+from states import states
+
+
+def test_pack_and_unpack():
+    game = Game(None, starting_level=1)
+    boids = game.level.flock.boids
+    boids[1].state = states.DYING
+    boids[1].death_clock = 1.5
+
+    rows = level_workers.pack_flock(boids)
+    level_workers.unpack_boid(boids[0], rows, 1)
+
+    assert boids[0].location == boids[1].location
+    assert boids[0].velocity == boids[1].velocity
+    assert (boids[0].state, boids[0].death_clock, boids[0].sex) == (states.DYING, 1.5, boids[1].sex)
+
+
+def test_step_level_matches_serial_step():
+    # The followers stay behind on the first level, the leader goes on to the second
+    game = Game(None, starting_level=2)
+    flock = game.levels[0].flock
+    for boid in [boid for boid in game.level.flock.boids if not boid.is_leader]:
+        game.level.flock.remove_boid(boid)
+        flock.add_boid(boid)
+
+    workers = level_workers.LevelWorkers(game, 1)
+    context = workers.context(game.levels[0])
+    workers.close()
+    level_workers.start_worker({})
+    rows, survivors, transfers = level_workers.step_level(
+        0, Settings.simulation_step, level_workers.pack_flock(flock.boids), context
+    )
+
+    flock.update(Settings.simulation_step)
+    assert survivors == list(range(len(flock.boids)))
+    assert transfers == []
+    for row, boid in enumerate(flock.boids):
+        x, y = rows[row * level_workers.ROW_SIZE:row * level_workers.ROW_SIZE + 2]
+        assert pygame.Vector2(x, y).distance_to(boid.location) < 1e-9
+
+
+def test_collect_removes_boids_which_died():
+    game = Game(None, starting_level=2)
+    flock = game.levels[0].flock
+    for boid in [boid for boid in game.level.flock.boids if not boid.is_leader]:
+        game.level.flock.remove_boid(boid)
+        flock.add_boid(boid)
+    dying = flock.boids[0]
+    dying.state = states.DYING
+    dying.death_clock = 1
+
+    workers = level_workers.LevelWorkers(game, 1)
+    try:
+        game.event_handler.advance(1)
+        assert not dying.alive
+        workers.collect(workers.submit([game.levels[0]], Settings.simulation_step))
+    finally:
+        workers.close()
+
+    assert dying not in flock.boids
+    assert len(flock.boids) == 8
+
+
+def worker_settings():
+    return Settings.use_flock_arrays, Settings.time_keeper_multiplier
+
+
+def test_settings_reach_spawned_workers():
+    use_flock_arrays, time_keeper_multiplier = Settings.use_flock_arrays, Settings.time_keeper_multiplier
+    Settings.use_flock_arrays, Settings.time_keeper_multiplier = True, 7
+    try:
+        game = Game(None, starting_level=1)
+        workers = level_workers.LevelWorkers(game, 1, multiprocessing.get_context('spawn'))
+        try:
+            assert workers.executor.submit(worker_settings).result() == (True, 7)
+        finally:
+            workers.close()
+    finally:
+        Settings.use_flock_arrays, Settings.time_keeper_multiplier = use_flock_arrays, time_keeper_multiplier
@@ -0,0 +1,34 @@
+from profiler import Profiler
+
+
+def test_disabled_records_nothing():
+    profiler = Profiler()
+    with profiler.phase('update'):
+        pass
+    profiler.end_frame()
+
+    assert profiler.averages() == []
+
+
+def test_rolling_average():
+    profiler = Profiler(window=2, enabled=True)
+    for seconds in 0.001, 0.002, 0.004:
+        profiler.add('update', seconds)
+        profiler.end_frame()
+
+    [(name, milliseconds)] = profiler.averages()
+    assert name == 'update'
+    assert abs(milliseconds - 3) < 1e-9
+
+
+def test_missing_phase_counts_as_zero():
+    profiler = Profiler(enabled=True)
+    profiler.add('draw', 0.002)
+    profiler.end_frame()
+    with profiler.phase('update'):
+        pass
+    profiler.end_frame()
+
+    averages = dict(profiler.averages())
+    assert abs(averages['draw'] - 1) < 1e-9
+    assert 'update' in averages
@@ -0,0 +1,37 @@
+from scheduler import Scheduler
+
+
+def test_actions_run_in_time_order_when_due():
+    scheduler = Scheduler()
+    ran = []
+    scheduler.schedule(2, ran.append, 'second')
+    scheduler.schedule(1, ran.append, 'first')
+    cancelled = scheduler.schedule(1.5, ran.append, 'cancelled')
+    scheduler.schedule(3, ran.append, 'later')
+    scheduler.cancel(cancelled)
+
+    scheduler.advance(2)
+    assert ran == ['first', 'second']
+    assert len(scheduler) == 1
+
+
+def test_actions_scheduled_whilst_running_wait_for_the_next_advance():
+    scheduler = Scheduler()
+    ran = []
+
+    def again():
+        ran.append(scheduler.time)
+        scheduler.schedule(scheduler.time, again)
+
+    scheduler.schedule(0, again)
+    scheduler.advance(1)
+    scheduler.advance(1)
+    assert ran == [1, 2]
+
+
+def test_cancelled_timers_are_dropped_from_the_heap():
+    scheduler = Scheduler()
+    timers = [scheduler.schedule(i, print) for i in range(10)]
+    [scheduler.cancel(timer) for timer in timers[:6]]
+    assert len(scheduler) == 4
+    assert len(scheduler._queue) < 10
@@ -0,0 +1,31 @@
+import random
+
+import pygame
+
+from spatial_hash import SpatialHash
+
+
+def test_nearby_finds_all_within_radius():
+    random.seed(1)
+    points = [
+        pygame.Vector2(random.uniform(-100, 1000), random.uniform(-100, 1000))
+        for _ in range(300)
+    ]
+    index = SpatialHash(200)
+    for i, point in enumerate(points):
+        index.insert(i, point)
+
+    for radius in 50, 200, 450:
+        for location in points[:20]:
+            expected = {i for i, point in enumerate(points) if location.distance_to(point) <= radius}
+            found = set(index.nearby(location, radius))
+            assert expected <= found
+
+
+def test_nearby_negative_coordinates():
+    index = SpatialHash(10)
+    index.insert('a', (-5, -5))
+    index.insert('b', (5, 5))
+    index.insert('c', (100, 100))
+
+    assert set(index.nearby((0, 0), 10)) == {'a', 'b'}
@@ -0,0 +1,63 @@
+import pygame
+
+import sprite_cache
+
+
+def make_sprite(colour, size):
+    sprite = pygame.Surface(size, pygame.SRCALPHA)
+    sprite.fill(colour)
+    return sprite
+
+
+def test_pack_round_trip(tmp_path):
+    sprites = {
+        ('small', 'male', angle): make_sprite((angle // 2, 100, 50, 128), (36, 36))
+        for angle in range(0, 360, 15)
+    }
+    sprites[('large', 'male', 0)] = make_sprite((1, 2, 3, 255), (72, 72))
+
+    atlas, rects = sprite_cache.pack(sprites)
+    image_path, index_path = str(tmp_path / 'sprites.rgba'), str(tmp_path / 'sprites.json')
+    sprite_cache.save(atlas, rects, image_path, index_path)
+    loaded = sprite_cache.load(image_path, index_path)
+
+    assert loaded.keys() == sprites.keys()
+    for key, sprite in sprites.items():
+        assert loaded[key].get_size() == sprite.get_size()
+        assert loaded[key].get_at((5, 5)) == sprite.get_at((5, 5))
+
+
+def test_cache_rebuilds_when_source_changes(tmp_path):
+    source = tmp_path / 'source.png'
+    source.write_bytes(b'one')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {('sprite',): make_sprite((10, 20, 30, 255), (4, 4))}
+
+    cache_folder = str(tmp_path / 'cache')
+    for _ in range(2):
+        sprites = sprite_cache.cached_sprites(cache_folder, 'test', [str(source)], 'step 15', build)
+    assert len(builds) == 1
+    assert sprites[('sprite',)].get_at((0, 0)) == (10, 20, 30, 255)
+
+    source.write_bytes(b'two')
+    sprite_cache.cached_sprites(cache_folder, 'test', [str(source)], 'step 15', build)
+    assert len(builds) == 2
+
+    sprite_cache.cached_sprites(cache_folder, 'test', [str(source)], 'step 5', build)
+    assert len(builds) == 3
+    assert len(list((tmp_path / 'cache').iterdir())) == 2
+
+
+def test_load_in_another_pixel_format(tmp_path):
+    sprites = {('sprite',): make_sprite((10, 20, 30, 200), (4, 4))}
+    atlas, rects = sprite_cache.pack(sprites)
+    # Red in the lowest byte, rather than blue
+    other_format = pygame.Surface(atlas.get_size(), pygame.SRCALPHA, 32, (0xff, 0xff00, 0xff0000, 0xff000000))
+    other_format.blit(atlas, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+    image_path, index_path = str(tmp_path / 'sprites.rgba'), str(tmp_path / 'sprites.json')
+    sprite_cache.save(other_format, rects, image_path, index_path)
+
+    assert sprite_cache.load(image_path, index_path)[('sprite',)].get_at((1, 1)) == (10, 20, 30, 200)
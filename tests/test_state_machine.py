@@ -0,0 +1,87 @@
+import pygame
+
+from enums import Events
+from game import Game
+from settings import Settings
+from states import states
+
+
+def members_match_states(flock):
+    return {
+        boid: state for state, boids in flock.members.items() for boid in boids
+    } == {boid: boid.state for boid in flock.boids}
+
+
+def test_members_follow_state_changes():
+    game = Game(None, starting_level=1)
+    flock = game.level.flock
+    boids = flock.boids
+    assert members_match_states(flock)
+
+    boids[0].state = states.LANDING
+    boids[1].state = states.SLEEPING
+    flock.remove_boid(boids[2])
+    game.levels[1].flock.add_boid(boids[2])
+    assert members_match_states(flock)
+    assert members_match_states(game.levels[1].flock)
+
+
+def test_broadcast_only_visits_boids_with_a_transition():
+    game = Game(None, starting_level=1)
+    flock = game.level.flock
+    sleeping, landed = flock.boids[0], flock.boids[1]
+    sleeping.state = states.SLEEPING
+    landed.state = states.LANDED
+
+    visited = []
+    original = states.SLEEPING.find_transition
+    states.SLEEPING.find_transition = lambda event, boid: visited.append(boid) or original(event, boid)
+    try:
+        game.event_handler.state_machine.handle_event(Events.START_OF_SUNSET)
+    finally:
+        del states.SLEEPING.find_transition
+
+    # Only LANDED has a transition for sunset
+    assert visited == []
+    assert landed.state is states.SLEEPING
+    assert sleeping.state is states.SLEEPING
+    assert all(boid.state is states.FLYING for boid in flock.boids[2:])
+    assert members_match_states(flock)
+
+
+def test_failed_guard_falls_through_to_next_transition():
+    game = Game(None, starting_level=1)
+    boid = game.level.flock.boids[0]
+    boid.in_landing_zone = True
+
+    game.event_handler.state_machine.handle_event(Events.TOGGLE_LANDING, boid)
+    assert boid.state is states.LANDED
+
+
+def test_broadcast_to_flock_store():
+    Settings.use_flock_arrays = True
+    try:
+        game = Game(None, starting_level=1)
+    finally:
+        Settings.use_flock_arrays = False
+    flock = game.level.flock
+    flying, landing, landed = flock.boids[:3]
+    landing.location = pygame.Vector2(landing.location.x, game.level.landing_zone_top + 50)
+    landing.state = states.LANDING
+    landed.state = states.LANDED
+
+    game.event_handler.state_machine.handle_event(Events.START_OF_NIGHTTIME)
+    assert flying.state is states.DYING and flying.death_clock == Settings.time_to_die
+    assert landing.state is states.DYING
+    assert landed.state is states.LANDED and landed.death_clock is None
+    assert members_match_states(flock)
+
+    # FLYING's transitions for landing are guarded, so they go one boid at a time
+    flying = flock.boids[3]
+    flying.state = states.FLYING
+    flying.in_landing_zone = True
+    game.event_handler.state_machine.handle_event(Events.TOGGLE_LANDING)
+    assert flying.state is states.LANDED
+    assert flying.location.y == game.level.landing_zone_top
+    assert landed.state is states.FLYING
+    assert members_match_states(flock)
@@ -0,0 +1,27 @@
+import pygame
+
+from text_cache import TextCache
+
+
+def test_render_is_cached():
+    pygame.font.init()
+    cache = TextCache(pygame.font.Font(None, 20), 2)
+    white = pygame.Color('white')
+
+    first = cache.render('Butterflies', white)
+    assert cache.render('Butterflies', white) is first
+    assert cache.render('Butterflies', pygame.Color('red')) is not first
+
+
+def test_least_recently_used_is_dropped():
+    pygame.font.init()
+    cache = TextCache(pygame.font.Font(None, 20), 2)
+    white = pygame.Color('white')
+
+    one = cache.render('one', white)
+    cache.render('two', white)
+    assert cache.render('one', white) is one
+    cache.render('three', white)
+
+    assert len(cache) == 2
+    assert cache.render('one', white) is one
@@ -0,0 +1,54 @@
+import pytest
+
+from enums import Events
+from game import Game
+from settings import Settings
+from time_keeper import TimeKeeper
+
+
+def make_time_keeper(speed=None):
+    game = Game(None, starting_level=1)
+    events = []
+    game.handle_event = lambda event, boid=None: events.append(event)
+    return TimeKeeper(game, speed), events
+
+
+def test_period_events_are_sent_by_update():
+    time_keeper, events = make_time_keeper(speed=1)
+    time_keeper.update(0)
+    assert events == [Events.START_OF_DAYTIME]
+
+    time_keeper.update(Settings.sunset_start_time - 1)
+    assert time_keeper.is_day and events == [Events.START_OF_DAYTIME]
+    time_keeper.update(1)
+    assert time_keeper.is_sunset
+    assert events == [Events.START_OF_DAYTIME, Events.START_OF_SUNSET]
+
+
+def test_fast_time_sends_every_period_in_order():
+    time_keeper, events = make_time_keeper(speed=1000)
+    time_keeper.update(0)
+    time_keeper.update(Settings.time_keeper_one_day_duration / 1000 + 0.001)
+
+    assert events == [
+        Events.START_OF_DAYTIME,
+        Events.START_OF_SUNSET,
+        Events.START_OF_NIGHTTIME,
+        Events.START_OF_SUNRISE,
+        Events.START_OF_DAYTIME,
+    ]
+    assert time_keeper.is_day
+    assert abs(time_keeper.current_time - 1) < 1e-6
+
+
+def test_set_time():
+    time_keeper, events = make_time_keeper()
+    time_keeper.set_time(Settings.night_start_time + 1)
+    assert time_keeper.is_night
+    time_keeper.update(0)
+    assert events == [Events.START_OF_NIGHTTIME]
+
+
+def test_negative_speed_is_rejected():
+    with pytest.raises(ValueError):
+        make_time_keeper(speed=-1)
@@ -0,0 +1,26 @@
+import collections
+
+
+class TextCache:
+    """
+    Least recently used cache of rendered lines of text, so unchanged text is not rendered again every frame
+    """
+    def __init__(self, font, maximum_size):
+        self.font = font
+        self.maximum_size = maximum_size
+        self._images = collections.OrderedDict()
+
+    def render(self, text, colour):
+        key = text, tuple(colour)
+        image = self._images.get(key)
+        if image is None:
+            image = self.font.render(text, True, colour)
+            self._images[key] = image
+            if len(self._images) > self.maximum_size:
+                self._images.popitem(last=False)
+        else:
+            self._images.move_to_end(key)
+        return image
+
+    def __len__(self):
+        return len(self._images)
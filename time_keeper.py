@@ -1,111 +1,130 @@
-import datetime
-import os
+import collections
 import math
 
-import pygame
-
 from settings import Settings
 from enums import Events
+from assets import assets
+
+
+Period = collections.namedtuple('Period', 'name start duration start_angle angle_duration image event')
 
 
 class TimeKeeper:
-    def __init__(self, game):
-        self.start = datetime.datetime.now()
+    """
+    Time of day, in game seconds since the start of the day, moved on by update with each simulation step
+
+    Game time runs speed times faster than the simulation, Settings.time_keeper_multiplier unless set otherwise
+    speed can be 0, to stop the clock, but not negative, as the clock only goes forwards
+    The current period is kept, and only looked at again once the time passes its end, when the event for the
+    start of the next period is sent
+    """
+    def __init__(self, game, speed=None):
+        self.speed = Settings.time_keeper_multiplier if speed is None else speed
+        if self.speed < 0:
+            raise ValueError(f'The time keeper speed must not be negative, not {self.speed}')
         self.canvas = game.canvas
         self.game = game
         path = 'images', 'time_keeper'
-        self.background = pygame.image.load(os.path.join(*path, 'clock_face.png'))
+        self.background = assets.image(*path, 'clock_face.png')
         self.background_rect = self.background.get_rect()
         self.background_rect.center = Settings.time_keeper_location
 
-        self.moon_image = pygame.image.load(os.path.join(*path, 'moon.png'))
-        self.sun_image = pygame.image.load(os.path.join(*path, 'sun.png'))
+        self.moon_image = assets.image(*path, 'moon.png')
+        self.sun_image = assets.image(*path, 'sun.png')
+
+        # In the order they happen, starting at the start of the day
+        self.periods = [
+            Period('day', Settings.day_start_time, Settings.day_duration, Settings.day_start_angle,
+                   Settings.day_angle_duration, self.sun_image, Events.START_OF_DAYTIME),
+            Period('sunset', Settings.sunset_start_time, Settings.sunset_duration, Settings.sunset_start_angle,
+                   Settings.sunset_angle_duration, self.sun_image, Events.START_OF_SUNSET),
+            Period('night', Settings.night_start_time, Settings.night_duration, Settings.night_start_angle,
+                   Settings.night_angle_duration, self.moon_image, Events.START_OF_NIGHTTIME),
+            Period('sunrise', Settings.sunrise_start_time, Settings.sunrise_duration, Settings.sunrise_start_angle,
+                   Settings.sunrise_angle_duration, self.moon_image, Events.START_OF_SUNRISE),
+        ]
+        self.current_time = 0
+        self.period = self.periods[0]
+        # The period whose event was sent last, so a new clock sends the event for the period it starts in
         self.current_period = ''
-        self.time_offset = 0
-
-    @property
-    def current_time(self):
-        real_seconds_since_start = (datetime.datetime.now() - self.start).total_seconds()
-        game_seconds_since_start = real_seconds_since_start * Settings.time_keeper_multiplier
-        game_seconds_since_start_of_day = game_seconds_since_start % Settings.time_keeper_one_day_duration
-        return game_seconds_since_start_of_day
 
     def set_time(self, seconds):
         """
-        Reset clock as it if started running x seconds ago
+        Move the clock to seconds into the day
+        The event for the new period, if it is a different one, is sent by the next update
+        """
+        self.current_time = seconds % Settings.time_keeper_one_day_duration
+        self.period = next(
+            period for period in reversed(self.periods) if period.start <= self.current_time
+        )
+
+    def update(self, duration):
+        """
+        Move the clock on by duration seconds of simulation time, sending the event for the start of each period
+        it reaches, in order
         """
-        self.start = datetime.datetime.now() - datetime.timedelta(seconds=seconds)
+        one_day = Settings.time_keeper_one_day_duration
+        elapsed = duration * self.speed
+        # No need to go round more than once, even when time runs very fast
+        if elapsed > one_day:
+            elapsed = one_day + elapsed % one_day
+        time = self.current_time + elapsed
+
+        period = self.period
+        while time >= period.start + period.duration:
+            self.announce(period)
+            index = self.periods.index(period) + 1
+            if index == len(self.periods):
+                index = 0
+                time -= one_day
+            period = self.periods[index]
+        self.current_time = time
+        self.period = period
+        self.announce(period)
+
+    def announce(self, period):
+        if period.name != self.current_period:
+            self.current_period = period.name
+            self.game.handle_event(period.event)
 
     @property
     def is_mating_season(self):
-        return 5 < self.current_time.seconds < 65
+        return 5 < self.current_time < 65
 
     @property
     def is_day(self):
-        return self.current_time < Settings.sunset_start_time
+        return self.period.name == 'day'
 
     @property
     def is_sunset(self):
-        return Settings.sunset_start_time <= self.current_time < Settings.night_start_time
+        return self.period.name == 'sunset'
 
     @property
     def is_night(self):
-        return Settings.night_start_time <= self.current_time < Settings.sunrise_start_time
+        return self.period.name == 'night'
 
     @property
     def is_sunrise(self):
-        return Settings.sunrise_start_time <= self.current_time
+        return self.period.name == 'sunrise'
 
-    def draw(self):
-        self.canvas.blit(self.background, self.background_rect)
-        # Calculate angle
-
-        if self.is_day:
-            period = 'day'
-            start_angle = Settings.day_start_angle
-            period_duration = Settings.day_duration
-            duration_into_period = self.current_time - Settings.day_start_time
-            period_angle_duration = Settings.day_angle_duration
-            image = self.sun_image
-        elif self.is_sunset:
-            period = 'sunset'
-            start_angle = Settings.sunset_start_angle
-            period_duration = Settings.sunset_duration
-            duration_into_period = self.current_time - Settings.sunset_start_time
-            period_angle_duration = Settings.sunset_angle_duration
-            image = self.sun_image
-        elif self.is_night:
-            period = 'night'
-            start_angle = Settings.night_start_angle
-            period_duration = Settings.night_duration
-            duration_into_period = self.current_time - Settings.night_start_time
-            period_angle_duration = Settings.night_angle_duration
-            image = self.moon_image
-        else:
-            period = 'sunrise'
-            start_angle = Settings.sunrise_start_angle
-            period_duration = Settings.sunrise_duration
-            duration_into_period = self.current_time - Settings.sunrise_start_time
-            period_angle_duration = Settings.sunrise_angle_duration
-            image = self.moon_image
-
-        if period != self.current_period:
-            self.current_period = period
-            event = {
-                'day': Events.START_OF_DAYTIME,
-                'sunset': Events.START_OF_SUNSET,
-                'night': Events.START_OF_NIGHTTIME,
-                'sunrise': Events.START_OF_SUNRISE
-            }[period]
-            self.game.handle_event(event)
-
-        period_angle = duration_into_period / period_duration * period_angle_duration
-
-        angle = start_angle + period_angle + Settings.time_keeper_angle_offset + 90
+    def hand(self):
+        """
+        The current period, and the sun or moon image with where it goes on the clock face
+        """
+        period = self.period
+        image = period.image
+        duration_into_period = self.current_time - period.start
+        period_angle = duration_into_period / period.duration * period.angle_duration
+
+        angle = period.start_angle + period_angle + Settings.time_keeper_angle_offset + 90
 
         x = -math.cos(math.radians(angle)) * Settings.time_keeper_radius + Settings.time_keeper_location[0]
         y = -math.sin(math.radians(angle)) * Settings.time_keeper_radius + Settings.time_keeper_location[1]
         rect = image.get_rect()
         rect.center = (x, y)
+        return period.name, image, rect
 
+    def draw(self):
+        self.canvas.blit(self.background, self.background_rect)
+        _, image, rect = self.hand()
         self.canvas.blit(image, rect)